@@ -0,0 +1,75 @@
+"""Checks string_cleaner against the original per-call implementation.
+
+Runs both cleaners over every cell of every CSV in data/csv_source and
+fails on the first output that differs. Run from the repository root:
+    python benchmarks/cleaner_equivalence.py
+"""
+import csv
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from BTM_Quote_Tool.string_utilities import substring_replacements, string_cleaner, string_cleaner_many
+
+
+def legacy_string_cleaner(text: str) -> str:
+    """string_cleaner as it was before the tables and patterns were precompiled."""
+    text = str(text)
+    if not re.search(r'\d{2}-\d{3}-\d{2}-\d{2}', text):
+        text = re.sub(r'[^\w\.\\\/°]', ' ', text).strip()
+    elif len(text) <= 10 or "load" in text:
+        text = re.sub(r'[^\w\.\\\/-]', ' ', text).strip()
+    else:
+        text = re.sub(r'[^\w-]', ' ', text).strip()
+    text = re.sub(r'\s+', ' ', text).strip().lower()
+
+    for original, sub in substring_replacements.items():
+        original_text = re.sub(r'\s+', ' ', original).strip().lower()
+        replacement = re.sub(r'\s+', ' ', sub).strip().lower()
+        text = text.replace(original_text, replacement) if original_text in text else text
+
+    pattern = r'(dài)\s+(\d+(\.\d+)?)\s*(mm|cm)'
+    if re.search(pattern, text):
+        def mm_to_cm(match):
+            value = float(match.group(2))
+            cm_value = value / 10.0 if match.group(4) == 'mm' else value
+            return f"dài {cm_value:.1f} cm" if cm_value % 1 else f"{int(cm_value)} cm"
+        text = re.sub(pattern, mm_to_cm, text)
+    pattern = r'(đầu|kích thước)\s+(\d+(\.\d+)?)\s*(mm)'
+    if re.search(pattern, text):
+        text = re.sub(pattern, r'\1 \2 \4', text)
+    pattern = r'(\d{3})\s*x\s*(\d{3})\s*x\s*(\d{2})\s*(mm)'
+    if re.search(pattern, text):
+        text = re.sub(pattern, r'\1x\2x\3 \4', text)
+    return text
+
+
+def main():
+    cells = []
+    for csv_path in sorted((ROOT / 'data/csv_source').glob('*.csv')):
+        with open(csv_path, 'r', encoding='utf-8') as csv_file:
+            cells.extend(cell for row in csv.reader(csv_file) for cell in row)
+    # Shapes that the bundled rows rarely exercise
+    cells.extend(substring_replacements)
+    cells.extend(['nhíp mang kim dài 150mm đầu 2.5mm', 'hộp 270 x 172 x 41 mm', '10-002-01-07 load', 'kềm mang kim'])
+
+    start = time.perf_counter()
+    expected = [legacy_string_cleaner(cell) for cell in cells]
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = string_cleaner_many(cells)
+    new_time = time.perf_counter() - start
+
+    for cell, old, new in zip(cells, expected, actual):
+        if old.encode('utf-8') != new.encode('utf-8') or string_cleaner(cell) != new:
+            print(f"MISMATCH {cell!r}: {old!r} != {new!r}")
+            sys.exit(1)
+    print(f"{len(cells)} cells identical. legacy {legacy_time:.3f} s, compiled {new_time:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
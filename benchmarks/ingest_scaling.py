@@ -0,0 +1,81 @@
+"""Cold load time of the three vendor CSVs against the number of cleaning processes.
+
+Loads KLS, Aesculap and Integra at once with `start_loads`, snapshots
+removed, for 1 to --max-workers processes and for each --scale of
+synthetic copies, and compares with loading them one after the other in
+the main process. Every parallel load is checked against that sequential
+one. Run from the repository root:
+
+    python benchmarks/ingest_scaling.py
+    python benchmarks/ingest_scaling.py --scales 1 10 --max-workers 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from BTM_Quote_Tool import start_loads
+from BTM_Quote_Tool.snapshot import snapshot_path
+from run import CSV_SOURCES, Fixture
+
+
+def drop_snapshots(fixture: Fixture):
+    for file_path in fixture.paths.values():
+        snapshot_path(file_path).unlink(missing_ok=True)
+
+
+def load_sequential(fixture: Fixture) -> dict:
+    loaders = {}
+    for name, (_, loader_class) in CSV_SOURCES.items():
+        loaders[name] = loader_class()
+        loaders[name].DataProcess(fixture.paths[name])
+    return loaders
+
+
+def load_parallel(fixture: Fixture, workers: int) -> dict:
+    loads = start_loads({name: (loader_class(), fixture.paths[name]) for name, (_, loader_class) in CSV_SOURCES.items()}, workers)
+    return {name: load.get() for name, load in loads.items()}
+
+
+def measure(fixture: Fixture, load, repeat: int) -> tuple[float, dict]:
+    times, loaders = [], None
+    for _ in range(repeat):
+        drop_snapshots(fixture)
+        start = time.perf_counter()
+        loaders = load()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), loaders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help="synthetic copies of the bundled rows")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3, help="cold loads per setting, the median is kept")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    print(f"{'scale':>6}{'rows':>9}{'workers':>9}{'seconds':>10}{'speedup':>9}")
+    for scale in args.scales:
+        fixture = Fixture(scale, tender_lines=0)
+        try:
+            baseline, expected = measure(fixture, lambda: load_sequential(fixture), args.repeat)
+            rows = sum(len(loader.dataset) for loader in expected.values())
+            print(f"{scale:>5}x{rows:>9}{'serial':>9}{baseline:>10.2f}{1:>9.2f}")
+            for workers in range(1, args.max_workers + 1):
+                seconds, loaders = measure(fixture, lambda: load_parallel(fixture, workers), args.repeat)
+                for name, loader in loaders.items():
+                    assert list(loader.dataset.items()) == list(expected[name].dataset.items()), name
+                print(f"{scale:>5}x{rows:>9}{workers:>9}{seconds:>10.2f}{baseline / seconds:>9.2f}")
+        finally:
+            fixture.close()
+
+
+if __name__ == '__main__':
+    main()
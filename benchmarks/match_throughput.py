@@ -0,0 +1,55 @@
+"""Throughput of find_best_match: per-pair loop against the batch scorer.
+
+Run from the repository root:
+    python benchmarks/match_throughput.py --lines 100
+"""
+import argparse
+import csv
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from BTM_Quote_Tool import KLSUtils
+from BTM_Quote_Tool.matcher import find_best_match
+
+
+def load_tender(lines: int) -> list[str]:
+    """Builds a synthetic tender from Aesculap conversion descriptions."""
+    with open(ROOT / 'data/csv_source/KLS_AESCULAP_CONVERSION.csv', 'r', encoding='utf-8') as csv_file:
+        csv_reader = csv.reader(csv_file)
+        next(csv_reader)
+        return [row[1] for _, row in zip(range(lines), csv_reader)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100, help="number of tender lines to match")
+    args = parser.parse_args()
+
+    kls = KLSUtils()
+    product_data = kls.DataProcess(ROOT / 'data/csv_source/KLS_PRODUCT.csv')
+    tender = load_tender(args.lines)
+    log = logging.getLogger('bench')
+    log.addHandler(logging.NullHandler())
+
+    results = {}
+    for batch in (False, True):
+        start = time.perf_counter()
+        results[batch] = find_best_match(log, log, tender, product_data, batch=batch, family_names=[], name_tags=[],
+                                         attributes=kls.attributes)
+        elapsed = time.perf_counter() - start
+        pairs = len(tender) * len({vn_descript for _, vn_descript in product_data.values()})
+        label = 'batch' if batch else 'loop'
+        print(f"{label:>5}: {elapsed:8.3f} s  {len(tender) / elapsed:8.1f} lines/s  {pairs / elapsed:12.0f} pairs/s")
+
+    identical = results[False] == results[True]
+    print(f"identical results: {identical}")
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""Benchmark suite over the bundled catalogs.
+
+Times each stage of the tool separately against data/csv_source and
+data/source_text, optionally scaled up with synthetic rows, records the
+peak Python memory of one traced run per stage and can save or compare
+JSON baselines. Run from the repository root:
+
+    python benchmarks/run.py                       # all stages, 1x data
+    python benchmarks/run.py --scale 10 --only load_kls kls_search
+    python benchmarks/run.py --save benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from BTM_Quote_Tool import AesculapUtils, IntegraUtils, KLSUtils, CatalogText, string_cleaner_many
+from BTM_Quote_Tool.matcher import find_best_match
+from BTM_Quote_Tool.match_cache import MatchCache
+from BTM_Quote_Tool.snapshot import snapshot_path
+
+CSV_SOURCES = {
+    'aesculap': ('KLS_AESCULAP_CONVERSION.csv', AesculapUtils),
+    'integra': ('INTEGRA_PRODUCT.csv', IntegraUtils),
+    'kls': ('KLS_PRODUCT.csv', KLSUtils),
+}
+SEARCH_QUERIES = [
+    'kéo mayo cong', 'kẹp phẫu tích', 'kìm kẹp kim', 'kẹp mạch máu cong 14 cm', 'dao',
+    'scissors mayo', 'needle holder', 'forceps', 'retractor', 'cm',
+]
+# Typed a word at a time, each search a refinement of the one before
+NARROWING_QUERIES = ['kéo', 'kéo mayo', 'kéo mayo cong', 'kéo mayo cong 17']
+STAGES = {}
+
+
+def stage(name: str):
+    def register(func):
+        STAGES[name] = func
+        return func
+    return register
+
+
+class Fixture:
+    """Scaled copies of the bundled CSVs in a scratch directory, loaded lazily."""
+
+    def __init__(self, scale: int, tender_lines: int):
+        self.scale = scale
+        self.tender_lines = tender_lines
+        self.workdir = Path(tempfile.mkdtemp(prefix='btm-bench-'))
+        self.paths = {name: self._scaled_copy(file_name) for name, (file_name, _) in CSV_SOURCES.items()}
+        self._loaded = {}
+
+    def _scaled_copy(self, file_name: str) -> Path:
+        target = self.workdir / file_name
+        if self.scale == 1:
+            shutil.copy(ROOT / 'data/csv_source' / file_name, target)
+            return target
+        with open(ROOT / 'data/csv_source' / file_name, 'r', encoding='utf-8') as source:
+            rows = list(csv.reader(source))
+        with open(target, 'w', encoding='utf-8', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(rows[0])
+            for copy in range(self.scale):
+                for row in rows[1:]:
+                    # Distinct codes per copy so the rows do not collapse into one
+                    writer.writerow([row[0].strip() + (f"-X{copy}" if copy else ""), *row[1:]])
+        return target
+
+    def loader(self, name: str):
+        if name not in self._loaded:
+            file_name, loader_class = CSV_SOURCES[name]
+            loader = loader_class()
+            loader.DataProcess(self.paths[name])
+            self._loaded[name] = loader
+        return self._loaded[name]
+
+    def drop_snapshot(self, name: str):
+        snapshot_path(self.paths[name]).unlink(missing_ok=True)
+
+    def tender(self) -> list[str]:
+        with open(ROOT / 'data/csv_source/KLS_AESCULAP_CONVERSION.csv', 'r', encoding='utf-8') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            next(csv_reader)
+            return [row[1] for _, row in zip(range(self.tender_lines), csv_reader)]
+
+    def close(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _load_stage(name: str, warm: bool):
+    def run(fixture: Fixture):
+        if warm:
+            fixture.loader(name)  # make sure a snapshot exists
+            return lambda: CSV_SOURCES[name][1]().DataProcess(fixture.paths[name])
+
+        def cold():
+            fixture.drop_snapshot(name)
+            CSV_SOURCES[name][1]().DataProcess(fixture.paths[name])
+        return cold
+    return run
+
+
+for _name in CSV_SOURCES:
+    stage(f"load_{_name}")(_load_stage(_name, warm=False))
+    stage(f"load_{_name}_snapshot")(_load_stage(_name, warm=True))
+
+
+@stage('string_cleaner')
+def bench_string_cleaner(fixture: Fixture):
+    with open(fixture.paths['kls'], 'r', encoding='utf-8') as csv_file:
+        cells = [cell for row in csv.reader(csv_file) for cell in row[1:]]
+    return lambda: string_cleaner_many(cells)
+
+
+@stage('kls_search')
+def bench_kls_search(fixture: Fixture):
+    kls = fixture.loader('kls')
+
+    def run():
+        kls._recent.clear()  # time the searches, not hits on the previous round's cache
+        return [kls.search(query) for query in SEARCH_QUERIES]
+    return run
+
+
+def _narrowing_stage(cached: bool):
+    def run(fixture: Fixture):
+        kls = fixture.loader('kls')
+
+        def narrow():
+            kls._recent.clear()
+            for query in NARROWING_QUERIES:
+                if not cached:
+                    kls._recent.clear()
+                kls.search(query)
+        return narrow
+    return run
+
+
+stage('kls_search_narrowing')(_narrowing_stage(cached=True))
+stage('kls_search_narrowing_cold')(_narrowing_stage(cached=False))
+
+
+@stage('search_by_code')
+def bench_search_by_code(fixture: Fixture):
+    kls, aesculap = fixture.loader('kls'), fixture.loader('aesculap')
+    codes = list(kls.dataset)[::max(1, len(kls.dataset) // 200)]
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for code in codes:
+                kls.SearchByCode(code, aesculap)
+    return run
+
+
+def _match_stage(batch: bool):
+    def run(fixture: Fixture):
+        kls = fixture.loader('kls')
+        product_data = kls.dataset
+        tender = fixture.tender()
+        log = logging.getLogger('benchmark')
+        log.addHandler(logging.NullHandler())
+        log.propagate = False
+        return lambda: find_best_match(log, log, tender, product_data, batch=batch, family_names=[], name_tags=[],
+                                       attributes=kls.attributes)
+    return run
+
+
+stage('find_best_match')(_match_stage(batch=False))
+stage('find_best_match_batch')(_match_stage(batch=True))
+
+
+@stage('find_best_match_cached')
+def bench_find_best_match_cached(fixture: Fixture):
+    kls = fixture.loader('kls')
+    product_data = kls.dataset
+    tender = fixture.tender()
+    log = logging.getLogger('benchmark')
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+    cache_path = fixture.workdir / 'match_cache.sqlite'
+    with MatchCache(cache_path) as cache:  # warm the on-disk level
+        find_best_match(log, log, tender, product_data, family_names=[], name_tags=[], attributes=kls.attributes, cache=cache)
+
+    def run():
+        # Fresh in-process level each run, so every hit comes from disk
+        with MatchCache(cache_path) as cache:
+            find_best_match(log, log, tender, product_data, family_names=[], name_tags=[], attributes=kls.attributes, cache=cache)
+    return run
+
+
+@stage('render')
+def bench_render(fixture: Fixture):
+    kls = fixture.loader('kls')
+    results = dict(list(kls.search('kẹp').items())[:300])
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            KLSUtils.display(results, ['kẹp'])
+    return run
+
+
+@stage('catalog_find')
+def bench_catalog_find(fixture: Fixture):
+    catalogs = [
+        CatalogText('AESCULAP', ROOT / 'data/source_text/AESCULAP_PDF.txt'),
+        CatalogText('INTEGRA', ROOT / 'data/source_text/INTEGRA_PDF.txt'),
+    ]
+    for catalog in catalogs:
+        catalog.open()  # index build is a one-off, keep it out of the timing
+    queries = ['sponge', 'needle holder', 'metzenbaum', 'bm021r', 'xyzzy']
+    return lambda: [catalog.find(query) for catalog in catalogs for query in queries]
+
+
+def measure(setup, fixture: Fixture, repeat: int) -> dict:
+    run = setup(fixture)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'runs': repeat,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Prints the ratio against a saved baseline, returns True on a regression."""
+    regressed = False
+    print(f"\n{'stage':<26}{'baseline':>12}{'now':>12}{'ratio':>8}")
+    for name, result in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if not before:
+            continue
+        ratio = result['median_s'] / before['median_s'] if before['median_s'] else float('inf')
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressed |= bool(flag)
+        print(f"{name:<26}{before['median_s'] * 1000:>10.1f}ms{result['median_s'] * 1000:>10.1f}ms{ratio:>8.2f}{flag}")
+    if baseline['meta'].get('scale') != results['meta']['scale']:
+        print("warning: baseline was recorded at a different --scale")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=1, help="replicate every CSV row this many times (10, 100, ...)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    parser.add_argument('--tender-lines', type=int, default=50, help="lines in the synthetic tender")
+    parser.add_argument('--only', nargs='+', choices=sorted(STAGES), metavar='STAGE', help="run only these stages")
+    parser.add_argument('--save', type=Path, help="write the results as a JSON baseline")
+    parser.add_argument('--compare', type=Path, help="compare against a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    fixture = Fixture(args.scale, args.tender_lines)
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'tender_lines': args.tender_lines,
+        },
+        'stages': {},
+    }
+    try:
+        print(f"{'stage':<26}{'median':>12}{'min':>12}{'peak mem':>14}")
+        for name in args.only or STAGES:
+            result = measure(STAGES[name], fixture, args.repeat)
+            results['stages'][name] = result
+            print(f"{name:<26}{result['median_s'] * 1000:>10.1f}ms{result['min_s'] * 1000:>10.1f}ms{result['peak_kib']:>11.0f}KiB")
+    finally:
+        fixture.close()
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"saved {args.save}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        sys.exit(1 if compare(results, baseline, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Load generator for src/server.py.
+
+Opens --clients concurrent connections to a running server and has each
+send --requests requests, mixing code lookups, keyword searches and small
+match batches, then prints throughput and latency percentiles per op.
+Start the server first, from the repository root:
+
+    python src/server.py &
+    python benchmarks/server_load.py --clients 16 --requests 200
+    python benchmarks/server_load.py --mix match --match-size 20
+"""
+import argparse
+import asyncio
+import csv
+import json
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SEARCH_QUERIES = ['kéo mayo cong', 'kẹp phẫu tích', 'kìm kẹp kim', 'dao', 'forceps', 'needle holder']
+
+
+def build_workload(mix: list[str], match_size: int) -> dict[str, list[dict]]:
+    with open(ROOT / 'data/csv_source/KLS_PRODUCT.csv', 'r', encoding='utf-8') as csv_file:
+        codes = [row[0] for _, row in zip(range(2000), csv.reader(csv_file))][1:]
+    with open(ROOT / 'data/csv_source/KLS_AESCULAP_CONVERSION.csv', 'r', encoding='utf-8') as csv_file:
+        tender = [row[1] for _, row in zip(range(500), csv.reader(csv_file))][1:]
+    workload = {
+        'lookup-code': [{'op': 'lookup-code', 'queries': [code]} for code in codes],
+        'search': [{'op': 'search', 'queries': [query], 'limit': 50} for query in SEARCH_QUERIES],
+        'match': [{'op': 'match', 'queries': tender[start:start + match_size]} for start in range(0, len(tender), match_size)],
+    }
+    return {op: workload[op] for op in mix}
+
+
+async def client(host: str, port: int, requests: int, workload: dict[str, list[dict]], latencies: dict, errors: list):
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+    ops = list(workload)
+    try:
+        for _ in range(requests):
+            op = random.choice(ops)
+            payload = json.dumps(random.choice(workload[op]), ensure_ascii=False).encode('utf-8') + b"\n"
+            start = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies[op].append(time.perf_counter() - start)
+            if not response.get('ok'):
+                errors.append(response.get('error'))
+    finally:
+        writer.close()
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args) -> int:
+    workload = build_workload(args.mix, args.match_size)
+    latencies, errors = defaultdict(list), []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, args.requests, workload, latencies, errors) for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{total} requests from {args.clients} clients in {elapsed:.2f}s: {total / elapsed:.0f} req/s")
+    print(f"{'op':<14}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, samples in sorted(latencies.items()):
+        ordered = sorted(samples)
+        print(f"{op:<14}{len(ordered):>8}{statistics.fmean(ordered) * 1000:>10.1f}"
+              + "".join(f"{percentile(ordered, pct) * 1000:>10.1f}" for pct in (50, 95, 99)))
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[0]}")
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=8, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=100, help="requests per connection")
+    parser.add_argument('--mix', nargs='+', choices=['lookup-code', 'search', 'match'], default=['lookup-code', 'search', 'match'])
+    parser.add_argument('--match-size', type=int, default=10, help="tender lines per match request")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
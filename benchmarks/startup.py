@@ -0,0 +1,76 @@
+"""Time to first prompt of src/main.py, with an import-time breakdown.
+
+Starts the REPL under `python -X importtime`, measures how long it takes
+until the first prompt is printed, answers it with '0' and then lists the
+slowest imports (cumulative and self time) that ran before the prompt:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PROMPT = b"Enter any key to start"
+
+
+def first_prompt(python: str) -> tuple[float, list[str]]:
+    """Returns (seconds to first prompt, importtime lines) for one run."""
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [python, '-X', 'importtime', 'main.py'], cwd=ROOT / 'src', env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    seen = b""
+    while PROMPT not in seen:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            process.kill()
+            raise RuntimeError("main.py exited before its first prompt")
+        seen += chunk
+    elapsed = time.perf_counter() - start
+    _, stderr = process.communicate(b"0\n", timeout=60)
+    return elapsed, [line for line in stderr.decode('utf-8', 'replace').splitlines() if line.startswith("import time:")]
+
+
+def parse_importtime(lines: list[str]) -> list[tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) per `-X importtime` line."""
+    rows = []
+    for line in lines[1:]:  # the first line is the header
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help="imports listed per table")
+    args = parser.parse_args()
+
+    timings, lines = [], []
+    for _ in range(args.runs):
+        elapsed, lines = first_prompt(sys.executable)
+        timings.append(elapsed)
+    rows = parse_importtime(lines)
+    total_imports = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+
+    print(f"time to first prompt: median {statistics.median(timings) * 1000:.0f} ms over {args.runs} runs "
+          f"(min {min(timings) * 1000:.0f} ms), of which imports {total_imports / 1000:.0f} ms")
+    print(f"\n{'top-level import':<40}{'cumulative ms':>14}")
+    for name, _, cumulative, _ in sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])[:args.top]:
+        print(f"{name:<40}{cumulative / 1000:>14.1f}")
+    print(f"\n{'module':<40}{'self ms':>14}")
+    for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{name:<40}{self_us / 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Memory a loaded vendor loader holds, attribute by attribute.
+
+For each bundled CSV, measures with tracemalloc the whole loader after
+DataProcess, then each attribute it keeps on its own (rebuilt from a
+pickle, so shared objects count once per attribute). The rows as the
+dict of tuples the loaders used to keep, and the size of the shared
+memory export of the store, are given for reference:
+
+    python benchmarks/store_memory.py
+"""
+import gc
+import pickle
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from BTM_Quote_Tool import AesculapUtils, IntegraUtils, KLSUtils
+
+SOURCES = [
+    ('KLS', KLSUtils, 'KLS_PRODUCT.csv'),
+    ('Aesculap', AesculapUtils, 'KLS_AESCULAP_CONVERSION.csv'),
+    ('Integra', IntegraUtils, 'INTEGRA_PRODUCT.csv'),
+]
+
+
+def allocated(build) -> tuple[object, int]:
+    """Runs build() and returns its result with the bytes it still holds."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def load(loader_class, file_name: str):
+    loader = loader_class()
+    loader.DataProcess(ROOT / 'data/csv_source' / file_name)
+    return loader
+
+
+def main():
+    for name, loader_class, file_name in SOURCES:
+        load(loader_class, file_name)  # first run writes the snapshot, measure the usual start up from it
+        loader, loader_size = allocated(lambda: load(loader_class, file_name))
+        print(f"{name} ({len(loader.dataset)} rows)")
+        print(f"  {'loader':<20}{loader_size / 1024:>10.0f} KiB")
+        for attribute, value in vars(loader).items():
+            if attribute.startswith('_'):  # per process caches, not snapshotted either
+                continue
+            blob = pickle.dumps(value)
+            _, size = allocated(lambda: pickle.loads(blob))
+            print(f"  {attribute:<20}{size / 1024:>10.0f} KiB")
+
+        blob = pickle.dumps(dict(loader.dataset.items()))
+        _, dict_size = allocated(lambda: pickle.loads(blob))
+        shared = loader.dataset.export_shared()
+        shared_size = shared.size
+        shared.close()
+        shared.unlink()
+        print(f"  {'(dict of tuples)':<20}{dict_size / 1024:>10.0f} KiB")
+        print(f"  {'(shared export)':<20}{shared_size / 1024:>10.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,44 @@
-from .string_utilities import string_cleaner
-from .process import AesculapUtils, KLSUtils, IntegraUtils, Color, SupportUtils
-from .config import load_config
+from importlib import import_module
+
+# Submodules are imported on first attribute access, so `from BTM_Quote_Tool
+# import load_config` does not drag in regex, numpy or rapidfuzz.
+_exports = {
+    'string_cleaner': 'string_utilities',
+    'string_cleaner_many': 'string_utilities',
+    'AesculapUtils': 'process',
+    'KLSUtils': 'process',
+    'IntegraUtils': 'process',
+    'Color': 'process',
+    'SupportUtils': 'process',
+    'load_config': 'config',
+    'CatalogText': 'catalog',
+    'DatasetWatcher': 'dataset',
+    'DatasetLoad': 'dataset',
+    'IngestPool': 'dataset',
+    'start_loads': 'dataset',
+    'recorder': 'instrumentation',
+    'span': 'instrumentation',
+    'timed': 'instrumentation',
+    'MatchCache': 'match_cache',
+    'QueryClient': 'client',
+    'ProductStore': 'store',
+    'RowSet': 'store',
+    'SelectedCodes': 'selection',
+    'SpellIndex': 'spelling',
+    'correct_query': 'spelling',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_exports])
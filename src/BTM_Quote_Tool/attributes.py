@@ -0,0 +1,141 @@
+import math
+import re
+from array import array
+from typing import Iterable
+
+# Loading (or unpickling) the KLS dataset goes through this module, so numpy
+# is only imported by the functions that score, keeping startup light.
+
+# Sizes, tips and boxes as string_cleaner leaves them, what the scorers read
+SIZE_PATTERN = re.compile(r'(dài)\s+(\d+(\.\d+)?)\s*(mm|cm)')
+TIP_PATTERN = re.compile(r'(đầu)\s+(\d+(\.\d+)?)\s*(mm)')
+BOX_PATTERN = re.compile(r'(\d{3})x(\d{3})x(\d{2}) mm')
+# The looser spellings string_cleaner rewrites into the forms above
+TIP_FORMAT_PATTERN = re.compile(r'(đầu|kích thước)\s+(\d+(\.\d+)?)\s*(mm)')
+BOX_FORMAT_PATTERN = re.compile(r'(\d{3})\s*x\s*(\d{3})\s*x\s*(\d{2})\s*(mm)')
+
+
+def _parse_values(pattern: re.Pattern, texts: list[str]) -> 'np.ndarray':
+    """Extracts the numeric group of `pattern` from each text, NaN where absent."""
+    import numpy as np
+    values = np.full(len(texts), np.nan)
+    for idx, text in enumerate(texts):
+        match = pattern.search(text)
+        if match:
+            values[idx] = float(match.group(2))
+    return values
+
+
+def _joined_length(tokens: set[str]) -> int:
+    """Length of the tokens joined by spaces, as token_set_ratio joins them."""
+    return sum(map(len, tokens)) + len(tokens) - 1 if tokens else 0
+
+
+def _ratio_bounds(length: int, lengths: 'np.ndarray') -> 'np.ndarray':
+    """Highest fuzz.ratio a string of `length` can reach against strings of `lengths`."""
+    import numpy as np
+    total = length + lengths
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, 200.0 * np.minimum(length, lengths) / total, 100.0)
+
+
+class ProductAttributes:
+    """Length, tip size and box dimensions of product descriptions, parsed once.
+
+    Values live in flat float arrays (NaN where a description has none),
+    one row per description given, so scoring a keyword against any set of
+    candidates is a gather plus one vectorized pass instead of two regex
+    searches per pair. The KLS loader keeps one row per row id of its
+    dataset. The text lengths and the rows holding each token are kept as
+    well, for the similarity upper bounds of `bounds`.
+    """
+
+    def __init__(self, descriptions: Iterable[str] = ()):
+        self.size = array('d')
+        self.tip = array('d')
+        self.box = array('d')       # three values per row
+        self.length = array('I')
+        self.token_length = array('I')
+        self.tokens: dict[str, array] = {}
+        for description in descriptions:
+            self.set(len(self), description)
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def set(self, row: int, description: str):
+        """Parses the description of a row, a new one when row is len(self)."""
+        size_match, tip_match = SIZE_PATTERN.search(description), TIP_PATTERN.search(description)
+        box_match = BOX_PATTERN.search(description)
+        size = float(size_match.group(2)) if size_match else math.nan
+        tip = float(tip_match.group(2)) if tip_match else math.nan
+        box = [float(value) for value in box_match.groups()] if box_match else [math.nan] * 3
+        tokens = set(description.split())
+        if row == len(self):
+            self.size.append(size)
+            self.tip.append(tip)
+            self.box.extend(box)
+            self.length.append(len(description))
+            self.token_length.append(_joined_length(tokens))
+        else:
+            self.size[row], self.tip[row], self.box[3 * row:3 * row + 3] = size, tip, array('d', box)
+            self.length[row], self.token_length[row] = len(description), _joined_length(tokens)
+        for token in tokens:
+            self.tokens.setdefault(token, array('I')).append(row)
+
+    def discard(self, row: int, description: str):
+        """Forgets a row's description, before it changes or goes away."""
+        for token in set(description.split()):
+            posting = self.tokens.get(token)
+            if posting is not None and row in posting:
+                posting.remove(row)
+                if not posting:
+                    del self.tokens[token]
+        self.size[row] = self.tip[row] = math.nan
+        self.box[3 * row:3 * row + 3] = array('d', [math.nan] * 3)
+        self.length[row] = self.token_length[row] = 0
+
+    def take(self, rows: 'np.ndarray') -> tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """Returns (size, tip, box) arrays of the given rows."""
+        import numpy as np
+        return (
+            np.frombuffer(self.size)[rows],
+            np.frombuffer(self.tip)[rows],
+            np.frombuffer(self.box).reshape(-1, 3)[rows],
+        )
+
+    def scores(self, keywords: list[str], rows: 'np.ndarray') -> tuple['np.ndarray', 'np.ndarray']:
+        """(keywords x rows) size and tip scores, as the scalar scorers give them."""
+        size, tip, _ = self.take(rows)
+        return (
+            _attribute_scores(_parse_values(SIZE_PATTERN, keywords), size),
+            _attribute_scores(_parse_values(TIP_PATTERN, keywords), tip),
+        )
+
+    def bounds(self, keyword: str, rows: 'np.ndarray') -> tuple['np.ndarray', 'np.ndarray']:
+        """Upper bounds of fuzz.ratio and fuzz.token_set_ratio of the keyword against each row's description.
+
+        The ratio is bounded by the two lengths. token_set_ratio can reach
+        100 when a token is shared, otherwise it is the ratio of the joined
+        token sets, bounded by their lengths.
+        """
+        import numpy as np
+        ratio_bounds = _ratio_bounds(len(keyword), np.frombuffer(self.length, dtype=np.uint32)[rows])
+        keyword_tokens = set(keyword.split())
+        if not keyword_tokens:
+            return ratio_bounds, np.zeros(len(rows))
+        shared = np.zeros(len(self), dtype=bool)
+        for token in keyword_tokens & self.tokens.keys():
+            shared[np.frombuffer(self.tokens[token], dtype=np.uint32)] = True
+        token_lengths = np.frombuffer(self.token_length, dtype=np.uint32)[rows]
+        token_set_bounds = np.where(shared[rows], 100.0, _ratio_bounds(_joined_length(keyword_tokens), token_lengths))
+        return ratio_bounds, np.where(token_lengths > 0, token_set_bounds, 0.0)
+
+
+def _attribute_scores(key_values: 'np.ndarray', product_values: 'np.ndarray') -> 'np.ndarray':
+    """Vectorized size/tip score, same tolerance and curve as the scalar version."""
+    import numpy as np
+    margin = np.abs(key_values[:, None] - product_values[None, :])
+    with np.errstate(invalid='ignore'):
+        scores = np.where(margin <= 0.5, 100.0, 100.0 / (margin + 1))
+    return np.nan_to_num(scores, nan=0.0)
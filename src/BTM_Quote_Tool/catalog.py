@@ -0,0 +1,288 @@
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from pathlib import Path
+from typing import NamedTuple
+from .process import Color
+from .snapshot import file_digest, file_fingerprint
+
+# Product code formats printed in each vendor's catalog text
+CATALOG_CODE_PATTERNS = {
+    'KLS': r'\d{2}-\d{3}-\d{2}-\d{2}',
+    'INTEGRA': r'(?<![\d-])\d{3}-\d{3}[A-Z]?(?![\d-])',
+    'AESCULAP': r'\b[A-Z]{2}\d{3}[A-Z]{1,2}\b',
+}
+
+INDEX_MAGIC = b'BTMCTIX1'
+# magic, size, mtime_ns, sha256, line count, directory entries
+INDEX_HEADER = struct.Struct('<8sQQ32sII')
+
+
+class CatalogHit(NamedTuple):
+    position: int           # byte offset of the hit in the text file
+    line_number: int        # 1-based
+    context: list[str]      # the hit line with its neighbours
+    code: str | None        # closest product code around the hit
+
+
+class CatalogText:
+    """Memory-mapped catalog text with a persistent line-level trigram index.
+
+    The index lives next to the text as <name>.idx: line offsets, a sorted
+    directory of trigram hashes and the posting lists of line numbers, all
+    read through mmap so resident memory does not grow with the catalog.
+    Candidate lines are always verified, a hash collision only costs a
+    wasted check.
+    """
+
+    def __init__(self, name: str, file_path: Path, code_pattern: str = None, n: int = 3):
+        self.name = name
+        self.file_path = Path(file_path)
+        self.code_pattern = re.compile(code_pattern or CATALOG_CODE_PATTERNS.get(name.upper(), r'$^'))
+        self.n = n
+        self.text = None
+        self.index = None
+
+    @property
+    def available(self) -> bool:
+        return self.file_path.exists()
+
+    def index_path(self) -> Path:
+        return self.file_path.with_name(self.file_path.name + ".idx")
+
+    def _gram_keys(self, text: str) -> set[int]:
+        n = self.n
+        return {zlib.crc32(text[i:i + n].encode('utf-8')) for i in range(len(text) - n + 1)}
+
+    def open(self) -> bool:
+        """Maps the text and its index, building the index when stale."""
+        if self.text is not None:
+            return True
+        if not self.available or os.path.getsize(self.file_path) == 0:
+            return False
+        with open(self.file_path, 'rb') as file:
+            self.text = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if not self._map_index():
+            self.build_index()
+            if not self._map_index():
+                raise OSError(f"Could not map catalog index {self.index_path()}")
+        return True
+
+    def close(self):
+        for view in (getattr(self, 'offsets', None), getattr(self, 'directory', None), getattr(self, 'postings', None)):
+            if view is not None:
+                view.release()
+        for mapped in (self.index, self.text):
+            if mapped is not None:
+                mapped.close()
+        self.text = self.index = None
+
+    def _map_index(self) -> bool:
+        try:
+            with open(self.index_path(), 'rb') as file:
+                index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, size, mtime_ns, digest, line_count, entries = INDEX_HEADER.unpack_from(index)
+        except struct.error:
+            index.close()
+            return False
+        stat = os.stat(self.file_path)
+        valid = magic == INDEX_MAGIC and size == stat.st_size and (
+            mtime_ns == stat.st_mtime_ns or digest == bytes.fromhex(file_digest(self.file_path))
+        )
+        if not valid:
+            index.close()
+            return False
+
+        view = memoryview(index)
+        start = INDEX_HEADER.size
+        self.line_count = line_count
+        self.offsets = view[start:start + 4 * (line_count + 1)].cast('I')
+        start += 4 * (line_count + 1)
+        self.directory = view[start:start + 12 * entries].cast('I')
+        start += 12 * entries
+        self.postings = view[start:].cast('I')
+        self.entries = entries
+        view.release()
+        self.index = index
+        return True
+
+    def build_index(self):
+        """Scans the text once and writes <name>.idx."""
+        size, mtime_ns, digest = file_fingerprint(self.file_path)
+        offsets = array('I', [0])
+        postings: dict[int, array] = {}
+        text = self.text
+        line_number = 0
+        text.seek(0)
+        for raw_line in iter(text.readline, b''):
+            offsets.append(offsets[-1] + len(raw_line))
+            line = raw_line.decode('utf-8', errors='replace').lower()
+            for key in self._gram_keys(line):
+                posting = postings.get(key)
+                if posting is None:
+                    postings[key] = array('I', (line_number,))
+                else:
+                    posting.append(line_number)
+            line_number += 1
+
+        directory = array('I')
+        flat = array('I')
+        for key in sorted(postings):
+            posting = postings[key]
+            directory.extend((key, len(flat), len(posting)))
+            flat.extend(posting)
+
+        temp = self.index_path().with_name(self.index_path().name + ".tmp")
+        with open(temp, 'wb') as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns, bytes.fromhex(digest), line_number, len(postings)))
+            offsets.tofile(file)
+            directory.tofile(file)
+            flat.tofile(file)
+        os.replace(temp, self.index_path())
+
+    def _posting(self, key: int):
+        directory = self.directory
+        low, high = 0, self.entries
+        while low < high:
+            mid = (low + high) // 2
+            if directory[3 * mid] < key:
+                low = mid + 1
+            else:
+                high = mid
+        if low == self.entries or directory[3 * low] != key:
+            return None
+        start, count = directory[3 * low + 1], directory[3 * low + 2]
+        return self.postings[start:start + count]
+
+    def _candidate_lines(self, keyword: str):
+        keys = self._gram_keys(keyword)
+        if not keys:
+            return range(self.line_count)
+        lists = []
+        for key in keys:
+            posting = self._posting(key)
+            if posting is None:
+                return ()
+            lists.append(posting)
+        lists.sort(key=len)
+
+        result = set(lists[0])
+        for posting in lists[1:]:
+            size = len(posting)
+            result = {
+                line for line in result
+                if (pos := bisect_left(posting, line)) < size and posting[pos] == line
+            }
+            if not result:
+                return ()
+        return sorted(result)
+
+    def _rarest_posting(self, text: str):
+        """Shortest posting list of the text's grams, () when one is missing, None when it has none."""
+        rarest = None
+        for key in self._gram_keys(text):
+            posting = self._posting(key)
+            if posting is None:
+                return ()
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        return rarest
+
+    def _wrapped_candidates(self, keyword: str) -> list[int]:
+        """Lines the keyword may start on and finish on the next one, broken at one of its spaces.
+
+        With grams on both sides of a break, pairs the rarest gram's lines
+        of each side, the pairs are verified anyway. A break with no grams
+        on either side is skipped, every line would be a candidate.
+        """
+        lines = set()
+        for split in range(len(keyword)):
+            if keyword[split] != ' ':
+                continue
+            head, tail = keyword[:split].rstrip(), keyword[split + 1:].lstrip()
+            if not head or not tail or max(len(head), len(tail)) < self.n:
+                continue
+            if len(head) >= self.n and len(tail) >= self.n:
+                heads, tails = self._rarest_posting(head), self._rarest_posting(tail)
+                lines.update(set(heads).intersection(line - 1 for line in tails))
+            elif len(head) >= self.n:
+                lines.update(self._candidate_lines(head))
+            else:
+                lines.update(line - 1 for line in self._candidate_lines(tail) if line)
+        lines.discard(self.line_count - 1)
+        return sorted(lines)
+
+    def _wrapped_column(self, line_number: int, keyword: str) -> int:
+        """Where the keyword starts on the line when it runs on into the next one, -1 when it does not."""
+        line = self.line(line_number).rstrip().lower()
+        column = (line + ' ' + self.line(line_number + 1).lstrip().lower()).find(keyword)
+        return column if column + len(keyword) > len(line) else -1
+
+    def line(self, line_number: int) -> str:
+        """Returns a 0-based line of the text without its line break."""
+        raw = self.text[self.offsets[line_number]:self.offsets[line_number + 1]]
+        return raw.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def _nearest_code(self, line_number: int, column: int, reach: int = 3) -> str | None:
+        """Closest code to the hit: same line first, then outwards."""
+        for distance in range(reach + 1):
+            for other in {line_number - distance, line_number + distance}:
+                if not 0 <= other < self.line_count:
+                    continue
+                matches = list(self.code_pattern.finditer(self.line(other)))
+                if matches:
+                    return min(matches, key=lambda match: abs(match.start() - column)).group(0)
+        return None
+
+    def find(self, keyword: str, limit: int = 5, context: int = 1) -> list[CatalogHit]:
+        """Case-insensitive lookup, hits in text order.
+
+        Finds what `keyword in text.lower()` finds within a line, and also
+        a keyword wrapped onto the next line at one of its spaces: the line
+        break and the spaces around it read as one space, as in text taken
+        from a PDF.
+        """
+        keyword = keyword.lower()
+        if not keyword or not self.open():
+            return []
+        hits = []
+        wrapped = self._wrapped_candidates(keyword) if ' ' in keyword.strip() else []
+        previous = None
+        for line_number in merge(self._candidate_lines(keyword), wrapped):
+            if line_number == previous:
+                continue
+            previous = line_number
+            line = self.line(line_number)
+            column = line.lower().find(keyword)
+            if column < 0 and wrapped:
+                column = self._wrapped_column(line_number, keyword)
+            if column < 0:
+                continue
+            first, last = max(0, line_number - context), min(self.line_count, line_number + context + 1)
+            hits.append(CatalogHit(
+                position=self.offsets[line_number] + len(line[:column].encode('utf-8')),
+                line_number=line_number + 1,
+                context=[self.line(other) for other in range(first, last)],
+                code=self._nearest_code(line_number, column),
+            ))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def __contains__(self, keyword: str) -> bool:
+        return bool(self.find(keyword, limit=1))
+
+    def display(self, hits: list[CatalogHit], keyword: str):
+        for hit in hits:
+            code = Color.wrap_text(hit.code, Color.YELLOW, None, True) if hit.code else "no code nearby"
+            print(f"{self.name} line {hit.line_number} (byte {hit.position}) _ {code}")
+            for line in hit.context:
+                print(f"    {Color.wrap_text(line, Color.GREEN, [keyword])}")
@@ -0,0 +1,62 @@
+import json
+import socket
+
+
+class QueryClient:
+    """Blocking client for server.py, one JSON line per request.
+
+    Connects on first use and reconnects after a dropped connection;
+    OSError is raised when the server cannot be reached, so callers can
+    fall back to their local datasets.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, timeout: float = 30.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        if self._socket is None:
+            self._socket = socket.create_connection(self.address, timeout=self.timeout)
+            self._file = self._socket.makefile('rwb')
+
+    def request(self, op: str, queries: list[str] = (), **options) -> list[dict]:
+        """Sends one request and returns its records; server-side errors raise RuntimeError."""
+        payload = json.dumps({'op': op, 'queries': list(queries), **options}, ensure_ascii=False).encode('utf-8') + b"\n"
+        for attempt in (1, 2):
+            try:
+                self._connect()
+                self._file.write(payload)
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("server closed the connection")
+                break
+            except OSError:
+                self.close()
+                if attempt == 2:
+                    raise
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise RuntimeError(response.get('error', "request failed"))
+        return response.get('records', [])
+
+    def search(self, keyword: str, limit: int = 0) -> dict[str, tuple[str, str]]:
+        """KLS search in the shape of `KLSUtils.search`: code -> (eng_descript, vn_descript)."""
+        return {
+            record['code']: (record['eng_descript'], record['vn_descript'])
+            for record in self.request('search', [keyword], limit=limit)
+        }
+
+    def lookup_code(self, code: str) -> dict:
+        return self.request('lookup-code', [code])[0]
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._file.close()
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = self._file = None
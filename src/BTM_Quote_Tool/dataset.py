@@ -0,0 +1,440 @@
+import csv
+import hashlib
+import os
+import threading
+import time
+from array import array
+from itertools import repeat
+from pathlib import Path
+from typing import Iterable, Sequence
+from .index import NgramIndex, RecentSearches
+from .snapshot import load_snapshot, save_snapshot, file_fingerprint
+from .instrumentation import span, count
+from .store import ProductStore, TextColumn
+from .spelling import SpellIndex
+from .string_utilities import fold_diacritics, has_diacritics
+
+
+def row_digest(row: list[str]) -> int:
+    """Short content hash of a raw CSV row, used to spot edited rows."""
+    return int.from_bytes(hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _clean_chunk(loader_class: type, rows: list[list[str]]) -> list:
+    return loader_class().clean_rows(rows)
+
+
+class IngestPool:
+    """Process pool cleaning CSV rows in chunks, for any number of loaders.
+
+    `clean_rows` splits the rows into `chunk_rows` chunks, cleans them in
+    the worker processes and hands the values back in row order. The pool
+    starts on first use, so restoring snapshots never spawns a process, and
+    loaders running on several threads share it. With one worker, or few
+    rows, rows are cleaned in the calling process.
+    """
+
+    def __init__(self, workers: int = None, chunk_rows: int = 1000):
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def clean_rows(self, loader: 'VendorDataset', rows: list[list[str]]) -> list:
+        if self.workers < 2 or len(rows) <= self.chunk_rows:
+            return loader.clean_rows(rows)
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor  # not needed by snapshot loads
+                self._executor = ProcessPoolExecutor(self.workers)
+            executor = self._executor
+        chunks = [rows[start:start + self.chunk_rows] for start in range(0, len(rows), self.chunk_rows)]
+        values = []
+        for chunk in executor.map(_clean_chunk, repeat(type(loader)), chunks):
+            values.extend(chunk)
+        return values
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.shutdown()
+
+
+def _bounds(column: TextColumn, rows: list[int]) -> tuple[Sequence[int], Sequence[int]]:
+    """Start and end offsets of the rows' texts in the column's buffer."""
+    spans = column.spans
+    if len(rows) == len(spans) // 2:  # every row, in order
+        return spans[0::2], spans[1::2]
+    return [spans[2 * row_id] for row_id in rows], [spans[2 * row_id + 1] for row_id in rows]
+
+
+def _contains(column: TextColumn, rows: list[int], needle: bytes) -> list[bool]:
+    """Per row, whether its text in the column holds needle (UTF-8)."""
+    starts, ends = _bounds(column, rows)
+    if len(rows) < 256:
+        find = column.blob.find
+        return [find(needle, start, end) != -1 for start, end in zip(starts, ends)]
+    # Read as latin-1, every byte is one character: offsets stay valid and str slicing is much cheaper
+    text, needle = str(column.blob, 'latin-1'), needle.decode('latin-1')
+    return [needle in text[start:end] for start, end in zip(starts, ends)]
+
+
+class VendorDataset:
+    """Loading, indexing and incremental refresh shared by the vendor loaders.
+
+    Subclasses describe their CSV through `row_code`, `clean_rows` and
+    `index_text`, and keep any extra lookup tables up to date in
+    `index_row` / `unindex_row`. The cleaned rows live in `dataset`, a
+    `ProductStore`, and are the only copy of the codes and texts: the
+    trigram index holds postings by the store's row ids and reads the
+    texts back from the store (`row_text`) to verify its hits. A removed
+    row leaves its id unused so the ids of the others stay valid.
+    The words of the indexed texts also feed `spelling`, the vocabulary
+    behind "did you mean", and their accent-stripped forms, kept in
+    `folded`, get their own trigram index, `folded_index`, searched by
+    `search_rows` for keywords typed without diacritics. `search_rows`
+    narrows from the session's recent searches when it can. Attributes
+    starting with an underscore are session state and stay out of the
+    snapshot.
+    """
+    text_columns = (0,)  # the store columns `index_text` joins with spaces
+
+    def __init__(self):
+        self.dataset = ProductStore()
+        self.index = NgramIndex(keep_texts=False)
+        self.folded_index = NgramIndex(keep_texts=False)
+        self.folded = TextColumn.build(())  # folded index text per row id, "" when folding changes nothing
+        self.spelling = SpellIndex()
+        self.row_hashes = array('Q')  # row_digest per row id
+        self.fingerprint = None
+        self._recent = RecentSearches()
+
+    def row_code(self, row: list[str]) -> str:
+        return row[0].strip()
+
+    def clean_rows(self, rows: list[list[str]]) -> list:
+        raise NotImplementedError
+
+    def index_text(self, value) -> str:
+        return value
+
+    def index_row(self, row_id: int, code: str, value):
+        """Hook for subclass lookup tables, called in row order."""
+
+    def unindex_row(self, row_id: int, code: str, value):
+        """Hook for subclass lookup tables, called before a row changes or goes away."""
+
+    def row_text(self, row_id: int) -> str | None:
+        """The indexed text of a row, read back from the store; None once removed."""
+        if row_id in self.dataset.removed:
+            return None
+        return self.index_text(self.dataset.row(row_id))
+
+    def folded_text(self, row_id: int) -> str | None:
+        if row_id in self.dataset.removed:
+            return None
+        return self.folded[row_id] or self.row_text(row_id)
+
+    def _filter_rows(self, row_ids: Iterable[int], keys: list[str], folded: bool) -> list[int]:
+        """The rows whose indexed text, or its folded form, contains every key.
+
+        Checked one key at a time on the UTF-8 bytes of the store's columns,
+        without decoding any row. A key with a space may straddle two
+        joined columns, those are checked on the decoded texts.
+        """
+        if len(self.text_columns) > 1 and any(' ' in key for key in keys):
+            text_of = self.folded_text if folded else self.row_text
+            return [row_id for row_id in row_ids if (text := text_of(row_id)) is not None and all(key in text for key in keys)]
+        removed = self.dataset.removed
+        rows = [row_id for row_id in row_ids if row_id not in removed] if removed else list(row_ids)
+        columns = [self.dataset.columns[column] for column in self.text_columns]
+        for key in keys:
+            if not rows:
+                break
+            needle = key.encode('utf-8')
+            hits = _contains(columns[0], rows, needle)
+            for column in columns[1:]:
+                hits = [hit or other for hit, other in zip(hits, _contains(column, rows, needle))]
+            if folded:
+                starts, ends = _bounds(self.folded, rows)
+                folded_hits = _contains(self.folded, rows, needle)
+                hits = [folded_hit if start != end else hit for hit, folded_hit, start, end in zip(hits, folded_hits, starts, ends)]
+            rows = [row_id for row_id, hit in zip(rows, hits) if hit]
+        return rows
+
+    def _fold(self, text: str) -> tuple[str, str]:
+        """(folded text to index, what `folded` keeps for it)."""
+        folded = fold_diacritics(text)
+        return folded, folded if folded != text else ""
+
+    def read_rows(self, file_path: Path) -> dict[str, list[str]]:
+        """Reads the CSV into code -> raw row; a repeated code keeps its last row.
+
+        Rows with fewer fields than the header, e.g. blank lines or a line
+        caught half saved, are skipped and reported.
+        """
+        rows, skipped = {}, 0
+        with open(file_path, 'r', encoding='utf-8') as csv_file:
+            csv_reader = csv.reader(csv_file)
+            header = next(csv_reader, None)
+            if not header:
+                raise ValueError(f"{Path(file_path).name} has no header row")
+            width = len(header)
+            for row in csv_reader:
+                if len(row) < width or not row[0].strip():
+                    skipped += 1
+                    continue
+                rows[self.row_code(row)] = row
+        if skipped:
+            print(f"Skipped {skipped} incomplete row(s) in {Path(file_path).name}.")
+        return rows
+
+    def load(self, file_path: Path, pool: IngestPool = None) -> ProductStore:
+        """Restores the snapshot of file_path or parses and cleans the whole CSV, in `pool` if given."""
+        name = type(self).__name__
+        with span(f"load.{name}.snapshot"):
+            if load_snapshot(file_path, self):
+                return self.dataset
+        fingerprint = file_fingerprint(file_path)
+        with span(f"load.{name}.read"):
+            rows = self.read_rows(file_path)
+        with span(f"load.{name}.clean"):
+            values = list(rows.values())
+            self.dataset = ProductStore(zip(rows, pool.clean_rows(self, values) if pool is not None else self.clean_rows(values)))
+        self.row_hashes = array('Q', map(row_digest, rows.values()))
+        self.fingerprint = fingerprint
+        with span(f"load.{name}.index"):
+            self.build_index()
+        save_snapshot(file_path, self, fingerprint)
+        return self.dataset
+
+    def build_index(self):
+        """Builds the trigram indexes and lookup tables of a freshly loaded store, whose row ids have no gaps."""
+        self._recent.clear()
+        items = self.dataset.items()
+        texts = [self.index_text(value) for _, value in items]
+        folds = [self._fold(text) for text in texts]
+        self.index = NgramIndex(texts, keep_texts=False)
+        self.folded_index = NgramIndex((folded for folded, _ in folds), keep_texts=False)
+        self.folded = TextColumn.build(kept for _, kept in folds)
+        self.spelling = SpellIndex()
+        for row_id, ((code, value), text) in enumerate(zip(items, texts)):
+            self.spelling.add_text(text)
+            self.index_row(row_id, code, value)
+
+    def search_rows(self, keywords: list[str]) -> list[int]:
+        """Row ids, in order, whose text contains every keyword.
+
+        Keywords without any diacritic are looked up in the folded texts,
+        so 'kep phau tich' finds 'kẹp phẫu tích'; accented ones in the
+        original texts. When a recent search used some of these keywords,
+        only its rows are checked for the others.
+        """
+        folded = not any(has_diacritics(keyword) for keyword in keywords)
+        index = self.folded_index if folded else self.index
+        keys = frozenset(keywords)
+        cached = self._recent.narrowest(folded, keys)
+        if cached is None:
+            row_ids = self._filter_rows(index.candidates(keywords), keywords, folded)
+        elif cached[0] == keys:
+            return list(cached[1])
+        else:
+            count('search.refined')
+            row_ids = self._filter_rows(cached[1], list(keys - cached[0]), folded)
+        self._recent.put(folded, keys, row_ids)
+        return list(row_ids)
+
+    def changed(self, file_path: Path) -> bool:
+        """Cheap check: has the CSV's size or mtime moved since it was loaded?"""
+        if self.fingerprint is None:
+            return True
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) != self.fingerprint[:2]
+
+    def refresh(self, file_path: Path) -> tuple[int, int, int] | None:
+        """Applies edits to the CSV in place.
+
+        Only added or modified rows are cleaned again; the dataset store, the
+        trigram index and the lookup tables are patched rather than rebuilt.
+        New codes are appended at the end of the dataset. Returns (added,
+        modified, removed), or None when the file content did not change.
+        """
+        if not self.changed(file_path):
+            return None
+        fingerprint = file_fingerprint(file_path)
+        if self.fingerprint is not None and fingerprint[::2] == self.fingerprint[::2]:
+            self.fingerprint = fingerprint  # touched, same content
+            return None
+
+        with span(f"refresh.{type(self).__name__}.read"):
+            rows = self.read_rows(file_path)
+        hashes = {code: row_digest(row) for code, row in rows.items()}
+        store, old_hashes = self.dataset, self.row_hashes
+        row_ids = {store.codes[row_id]: row_id for row_id in store.row_ids()}
+        removed = [code for code in row_ids if code not in hashes]
+        modified = [code for code, digest in hashes.items() if code in row_ids and old_hashes[row_ids[code]] != digest]
+        added = [code for code in hashes if code not in row_ids]
+        with span(f"refresh.{type(self).__name__}.clean"):
+            values = self.clean_rows([rows[code] for code in modified + added])
+
+        self._recent.clear()
+        for code in removed:
+            self._remove_row(row_ids[code], code)
+        for code, value in zip(modified, values):
+            self._replace_row(row_ids[code], code, value)
+        for code, value in zip(added, values[len(modified):]):
+            row_ids[code] = self._add_row(code, value)
+
+        self.row_hashes.extend([0] * (len(store.codes) - len(self.row_hashes)))
+        for code, digest in hashes.items():
+            self.row_hashes[row_ids[code]] = digest
+        self.fingerprint = fingerprint
+        save_snapshot(file_path, self, fingerprint)
+        return len(added), len(modified), len(removed)
+
+    def _add_row(self, code: str, value) -> int:
+        self.dataset[code] = value
+        text = self.index_text(value)
+        row_id = self.index.add(text)
+        folded, kept = self._fold(text)
+        self.folded_index.add(folded)
+        self.folded.append(kept)
+        self.spelling.add_text(text)
+        self.index_row(row_id, code, value)
+        return row_id
+
+    def _replace_row(self, row_id: int, code: str, value):
+        old_value = self.dataset.row(row_id)
+        self.unindex_row(row_id, code, old_value)
+        old_text, text = self.index_text(old_value), self.index_text(value)
+        folded, kept = self._fold(text)
+        self.spelling.remove_text(old_text)
+        self.index.replace(row_id, text, old_text)
+        self.folded_index.replace(row_id, folded, self.folded_text(row_id))
+        self.folded.set(row_id, kept)
+        self.dataset[code] = value
+        self.spelling.add_text(text)
+        self.index_row(row_id, code, value)
+
+    def _remove_row(self, row_id: int, code: str):
+        value = self.dataset.row(row_id)
+        self.unindex_row(row_id, code, value)
+        text = self.index_text(value)
+        self.spelling.remove_text(text)
+        self.index.remove(row_id, text)
+        self.folded_index.remove(row_id, self.folded_text(row_id))
+        del self.dataset[code]
+
+
+class DatasetLoad:
+    """Runs `loader.DataProcess(file_path, pool)` on a background thread.
+
+    `ready` tells whether the data is in; `get` blocks until it is and
+    returns the loader, so a command only waits for the datasets it uses.
+    """
+
+    def __init__(self, loader: VendorDataset, file_path: Path, pool: IngestPool = None):
+        self.loader = loader
+        self.file_path = file_path
+        self.pool = pool
+        self.seconds = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"load-{type(loader).__name__}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.loader.DataProcess(self.file_path, self.pool)
+        finally:
+            self.seconds = time.perf_counter() - start
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def get(self, timeout: float = None) -> VendorDataset:
+        self._done.wait(timeout)
+        return self.loader
+
+
+def start_loads(sources: dict[str, tuple[VendorDataset, Path]], workers: int = None) -> dict[str, DatasetLoad]:
+    """Starts loading every source at once, all cleaning in one `IngestPool`.
+
+    The pool's processes are shut down once every load is in.
+    """
+    pool = IngestPool(workers)
+    loads = {name: DatasetLoad(loader, file_path, pool) for name, (loader, file_path) in sources.items()}
+
+    def close():
+        for load in loads.values():
+            load.get()
+        pool.shutdown()
+    threading.Thread(target=close, name="load-pool", daemon=True).start()
+    return loads
+
+
+class DatasetWatcher:
+    """Applies CSV edits as soon as the file is saved.
+
+    A daemon thread stats the sources every `interval` seconds and runs
+    `refresh` on the ones whose size or mtime moved. The REPL holds `lock`
+    while it handles a command, so a refresh never lands mid-search.
+    """
+
+    def __init__(self, sources: dict[str, tuple[VendorDataset, Path]], interval: float = 1.0):
+        self.sources = sources
+        self.interval = interval
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self) -> dict[str, tuple[int, int, int]]:
+        """Refreshes every changed source, returns the changes per source name."""
+        changes = {}
+        for name, (loader, file_path) in self.sources.items():
+            if not loader.changed(file_path):
+                continue
+            with self.lock:
+                try:
+                    result = loader.refresh(file_path)
+                except (OSError, csv.Error, UnicodeDecodeError, IndexError, ValueError) as err:
+                    # Most likely caught mid-save, the next poll retries
+                    print(f"Error refreshing {name} data: {err}")
+                    continue
+            if result:
+                changes[name] = result
+        return changes
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for name, (added, modified, removed) in self.poll().items():
+                print(f"\n{name} updated: {added} added, {modified} modified, {removed} removed.")
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dataset-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
@@ -1,4 +1,7 @@
+import json
+import os
 from pathlib import Path
+from typing import Iterator
 
 def load_input(config : object, source : str, file_path : str) -> list[str]:
     """Loads input keywords from a file."""
@@ -12,9 +15,106 @@ def load_input(config : object, source : str, file_path : str) -> list[str]:
 
 
 
+def iter_input(config : object, source : str, file_path : str) -> Iterator[str]:
+    """Yields input keywords one line at a time."""
+    try:
+        file_path = Path(config[source][file_path]).resolve()
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                yield line.rstrip('\n')
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+
+
+
 def save_output(config : object, source : str, file_path: str, data: list):
     file_path = Path(config[source][file_path]).resolve()
     """Saves the output data (codes or descriptions) to a file."""
     with open(file_path, 'w', encoding='utf-8') as file:
         for result in data:
-            file.write(f"{result}\n")
\ No newline at end of file
+            file.write(f"{result}\n")
+
+
+
+class StreamWriter:
+    """Writes results line by line to several outputs with a resumable checkpoint.
+
+    Lines are buffered and flushed every `batch_size` lines. After each flush
+    the checkpoint records how many lines are done and the byte size of every
+    output, so a rerun truncates whatever was written past it and carries on.
+    `source_stamp` identifies the input; a checkpoint for another input is
+    ignored and the run starts over.
+    """
+
+    def __init__(self, outputs: dict[str, Path], checkpoint: Path, batch_size: int = 100, source_stamp: list = None):
+        self.outputs = {name: Path(path) for name, path in outputs.items()}
+        self.checkpoint = Path(checkpoint)
+        self.batch_size = batch_size
+        self.source_stamp = source_stamp
+        self.done = 0
+        self.files = {}
+        self.buffers = {name: [] for name in self.outputs}
+
+    def _read_checkpoint(self) -> dict | None:
+        try:
+            with open(self.checkpoint, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if state.get('source') != self.source_stamp or set(state.get('sizes', {})) != set(self.outputs):
+            return None
+        return state
+
+    def resume(self) -> int:
+        """Opens the outputs, returns the number of input lines already done."""
+        state = self._read_checkpoint()
+        for name, path in self.outputs.items():
+            if state is None:
+                self.files[name] = open(path, 'w', encoding='utf-8')
+            else:
+                file = open(path, 'a+', encoding='utf-8')
+                file.truncate(state['sizes'][name])
+                file.seek(0, os.SEEK_END)
+                self.files[name] = file
+        self.done = state['done'] if state else 0
+        return self.done
+
+    def write(self, **values):
+        """Buffers one line per output, e.g. write(code=..., product=...)."""
+        for name, value in values.items():
+            self.buffers[name].append(f"{value}\n")
+        self.done += 1
+        if self.done % self.batch_size == 0:
+            self.flush()
+
+    def flush(self):
+        sizes = {}
+        for name, file in self.files.items():
+            file.writelines(self.buffers[name])
+            self.buffers[name].clear()
+            file.flush()
+            os.fsync(file.fileno())
+            sizes[name] = file.tell()
+        temp = self.checkpoint.with_name(self.checkpoint.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump({'source': self.source_stamp, 'done': self.done, 'sizes': sizes}, file)
+        os.replace(temp, self.checkpoint)
+
+    def close(self, complete: bool = True):
+        """Flushes the outputs; a completed run drops its checkpoint."""
+        if not self.files:
+            return
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+        if complete:
+            os.remove(self.checkpoint)
+
+    def __enter__(self):
+        if not self.files:
+            self.resume()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close(complete=exc_type is None)
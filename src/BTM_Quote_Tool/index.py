@@ -0,0 +1,167 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+
+class NgramIndex:
+    """Trigram posting lists over product texts.
+
+    Keeps the "every keyword is a substring" semantics of
+    `SupportUtils.all_keys_exist`: posting lists only narrow the candidate
+    rows, the survivors are always verified against the original text.
+    Removed rows keep their id with a None text. Built with
+    `keep_texts=False` the index holds only the postings, for texts kept
+    elsewhere by row id (the loaders read them back from their
+    `ProductStore`): callers verify `candidates` themselves and pass
+    `replace` / `remove` the text being dropped.
+    """
+
+    def __init__(self, texts: Iterable[str] = (), n: int = 3, keep_texts: bool = True):
+        self.n = n
+        self.texts: list[str | None] | None = [] if keep_texts else None
+        self.size = 0  # row ids handed out
+        self.postings: dict[str, array] = {}
+        self.live = 0
+        for text in texts:
+            self.add(text)
+
+    def __len__(self) -> int:
+        return self.live
+
+    def grams(self, text: str) -> set[str]:
+        """Returns the distinct n-grams of a text."""
+        n = self.n
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def add(self, text: str) -> int:
+        """Appends a text and returns its row id."""
+        row_id = self.size
+        self.size += 1
+        if self.texts is not None:
+            self.texts.append(text)
+        postings = self.postings
+        for gram in self.grams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                postings[gram] = array('I', (row_id,))
+            else:
+                posting.append(row_id)
+        self.live += 1
+        return row_id
+
+    def _unpost(self, gram: str, row_id: int):
+        posting = self.postings[gram]
+        del posting[bisect_left(posting, row_id)]
+        if not posting:
+            del self.postings[gram]
+
+    def _post(self, gram: str, row_id: int):
+        posting = self.postings.get(gram)
+        if posting is None:
+            self.postings[gram] = array('I', (row_id,))
+        else:
+            insort(posting, row_id)
+
+    def replace(self, row_id: int, text: str, old_text: str = None):
+        """Re-indexes a row in place, touching only the n-grams that changed."""
+        if old_text is None:
+            old_text = self.texts[row_id]
+        old_grams, new_grams = self.grams(old_text), self.grams(text)
+        for gram in old_grams - new_grams:
+            self._unpost(gram, row_id)
+        for gram in new_grams - old_grams:
+            self._post(gram, row_id)
+        if self.texts is not None:
+            self.texts[row_id] = text
+
+    def remove(self, row_id: int, old_text: str = None):
+        text = old_text if old_text is not None else self.texts[row_id]
+        if text is None:
+            return
+        for gram in self.grams(text):
+            self._unpost(gram, row_id)
+        if self.texts is not None:
+            self.texts[row_id] = None
+        self.live -= 1
+
+    def candidates(self, keys: list[str]) -> Iterable[int]:
+        """Returns row ids that contain every n-gram of every key."""
+        grams = set()
+        for key in keys:
+            if len(key) >= self.n:
+                grams |= self.grams(key)
+        if not grams:
+            return range(self.size)
+
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if len(posting) > 8 * len(result):
+                # Probe the long list instead of materialising it as a set
+                size = len(posting)
+                result = {
+                    row_id for row_id in result
+                    if (pos := bisect_left(posting, row_id)) < size and posting[pos] == row_id
+                }
+            else:
+                result.intersection_update(posting)
+            if not result:
+                return ()
+        return sorted(result)
+
+    def search(self, keys: list[str]) -> list[int]:
+        """Returns row ids, in insertion order, whose text contains all keys."""
+        texts = self.texts
+        return [
+            row_id for row_id in self.candidates(keys)
+            if (text := texts[row_id]) is not None and all(key in text for key in keys)
+        ]
+
+
+class RecentSearches:
+    """The last `capacity` searches of a session with their row ids.
+
+    `narrowest` finds, among the cached searches over the same texts, the
+    one with the fewest rows whose keywords are all part of a new search,
+    so "kéo mayo cong" after "kéo mayo" only checks the rows "kéo mayo"
+    found. Row ids go stale when the texts change: `clear` on refresh.
+    """
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self.entries: OrderedDict[tuple[Hashable, frozenset[str]], list[int]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def narrowest(self, scope: Hashable, keys: frozenset[str]) -> tuple[frozenset[str], list[int]] | None:
+        """(keys, row ids) of the best cached search to start from, None when there is none."""
+        with self.lock:
+            best = None
+            for (entry_scope, entry_keys), row_ids in self.entries.items():
+                if entry_scope == scope and entry_keys <= keys and (best is None or len(row_ids) < len(best[1])):
+                    best = (entry_keys, row_ids)
+            if best is not None:
+                self.entries.move_to_end((scope, best[0]))
+            return best
+
+    def put(self, scope: Hashable, keys: frozenset[str], row_ids: list[int]):
+        with self.lock:
+            self.entries[(scope, keys)] = row_ids
+            self.entries.move_to_end((scope, keys))
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
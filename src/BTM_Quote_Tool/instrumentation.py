@@ -0,0 +1,136 @@
+import atexit
+import json
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from functools import wraps
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder: 'Recorder', name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+
+
+class Recorder:
+    """Timing spans and counters for the hot paths.
+
+    Disabled by default, and then `span` hands back one shared no-op
+    context and `count` returns straight away. Once enabled, the last
+    `max_samples` durations per span are kept for percentiles, and every
+    span can also be appended to a JSON lines file for offline analysis.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.enabled = False
+        self.max_samples = max_samples
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self.totals = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.dump_file = None
+
+    def enable(self, dump_path: str = None):
+        self.enabled = True
+        if dump_path and self.dump_file is None:
+            self.dump_file = open(dump_path, 'a', encoding='utf-8', buffering=1 << 16)
+            atexit.register(self.close)
+
+    def disable(self):
+        self.enabled = False
+        self.close()
+
+    def close(self):
+        if self.dump_file is not None:
+            self.dump_file.write(json.dumps({'counters': dict(self.counters), 'pid': os.getpid(), 'ts': time.time()}) + "\n")
+            self.dump_file.close()
+            self.dump_file = None
+
+    def reset(self):
+        self.samples.clear()
+        self.totals.clear()
+        self.counters.clear()
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def record(self, name: str, duration: float):
+        self.samples[name].append(duration)
+        self.totals[name] += 1
+        if self.dump_file is not None:
+            self.dump_file.write(json.dumps({
+                'span': name, 'ms': round(duration * 1000, 4), 'pid': os.getpid(), 'ts': time.time()
+            }) + "\n")
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def report(self) -> str:
+        """Per-span p50/p95/p99 in milliseconds, then the counters."""
+        if not self.samples and not self.counters:
+            return "No measurements yet." if self.enabled else "Instrumentation is off, start with --stats."
+        lines = [f"{'stage':<28}{'calls':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name in sorted(self.samples):
+            ordered = sorted(self.samples[name])
+            lines.append(
+                f"{name:<28}{self.totals[name]:>8}"
+                + "".join(f"{percentile(ordered, pct) * 1000:>10.2f}" for pct in (50, 95, 99))
+            )
+        if self.counters:
+            lines.append("")
+            lines.extend(f"{name:<28}{value:>8}" for name, value in sorted(self.counters.items()))
+            lines.extend(_rates(self.counters))
+        return "\n".join(lines)
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _rates(counters: dict[str, int]) -> list[str]:
+    keywords = counters.get('match.keywords')
+    if not keywords:
+        return []
+    lines = [f"{'match.candidates/keyword':<28}{counters.get('match.candidates_scored', 0) / keywords:>8.1f}"]
+    for name, label in (('match.name_filter_hits', 'name filter hit rate'), ('match.tag_filter_hits', 'tag filter hit rate'),
+                        ('match.stats_filter_hits', 'stats filter hit rate'), ('match.full_catalog', 'full catalog rate')):
+        lines.append(f"{label:<28}{counters.get(name, 0) / keywords:>8.1%}")
+    candidates = counters.get('match.candidates_scored')
+    for stage in ('length', 'tokens', 'token_set', 'ratio'):
+        if candidates and f'match.pruned_{stage}' in counters:
+            lines.append(f"{f'pruned by {stage}':<28}{counters[f'match.pruned_{stage}'] / candidates:>8.1%}")
+    return lines
+
+
+recorder = Recorder()
+span = recorder.span
+count = recorder.count
+
+
+def timed(name: str):
+    """Decorator form of `span`."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return func(*args, **kwargs)
+            with recorder.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,160 @@
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+from .scorer import fuzz_score, size_matching_score, tip_matching_score, combine_scores, best_similarity
+
+# (code, match, score); match is None when nothing scored high enough
+MatchResult = tuple[str, str | None, float]
+
+
+def scoring_fingerprint() -> str:
+    """Digest of the scoring functions' bytecode and constants, i.e. their weights."""
+    digest = hashlib.blake2b(digest_size=8)
+    for func in (fuzz_score, size_matching_score, tip_matching_score, combine_scores, best_similarity):
+        code = func.__code__
+        digest.update(code.co_code)
+        digest.update(repr(code.co_consts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def match_namespace(products: Iterable[tuple[str, str, str]], family_names: list[str], name_tags: list[str],
+                    vocabulary: dict[str, str] = None) -> str:
+    """Everything a match result depends on besides the keyword, as one digest.
+
+    Covers the products, (vn_descript, eng_descript, code) as
+    `MatcherContext.products` yields them, the filter word lists, the
+    stats vocabulary and the scoring weights, so editing the CSV (or the
+    scorer) moves every lookup to a fresh namespace and the old entries are
+    never served again.
+    """
+    digest = hashlib.blake2b(scoring_fingerprint().encode('utf-8'), digest_size=16)
+    for description, eng_descript, code in products:
+        digest.update(f"{description}\x1f{eng_descript}\x1f{code}\x1e".encode('utf-8'))
+    for words in (family_names, name_tags):
+        digest.update(b"\x1d" + "\x1f".join(words).encode('utf-8'))
+    for phrase, stat in (vocabulary or {}).items():
+        digest.update(f"\x1c{phrase}\x1f{stat}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MatchCache:
+    """Two-level cache of `find_best_match` results per cleaned keyword.
+
+    An in-process LRU of `capacity` entries sits in front of a SQLite file
+    holding at most `max_entries` rows; past that the least recently used
+    rows are evicted on `flush`. Without a path only the in-process level is
+    used. Writes and recency updates are batched until `flush`/`close`.
+    """
+
+    def __init__(self, path: Path = None, capacity: int = 4096, max_entries: int = 100000):
+        self.path = Path(path) if path else None
+        self.capacity = capacity
+        self.max_entries = max_entries
+        self.memory: OrderedDict[tuple[str, str], MatchResult] = OrderedDict()
+        self.hits = self.misses = 0
+        self._pending: dict[tuple[str, str], MatchResult] = {}
+        self._touched: set[tuple[str, str]] = set()
+        self._db = None
+        self._clock = 0
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._db is None and self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(self.path)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS matches (namespace TEXT, keyword TEXT, code TEXT, match TEXT,"
+                    " score REAL, used INTEGER, PRIMARY KEY (namespace, keyword)) WITHOUT ROWID"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS matches_used ON matches (used)")
+                self._clock = self._db.execute("SELECT COALESCE(MAX(used), 0) FROM matches").fetchone()[0]
+            except sqlite3.Error as err:
+                # The cache only saves time, carry on with the in-process level
+                print(f"Match cache disabled, {self.path}: {err}")
+                self.path, self._db = None, None
+        return self._db
+
+    def _remember(self, key: tuple[str, str], result: MatchResult):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def get(self, namespace: str, keyword_cleaned: str) -> MatchResult | None:
+        key = (namespace, keyword_cleaned)
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory.move_to_end(key)
+            self._touched.add(key)
+            self.hits += 1
+            return result
+
+        db = self._connect()
+        row = db.execute(
+            "SELECT code, match, score FROM matches WHERE namespace = ? AND keyword = ?", key
+        ).fetchone() if db else None
+        if row is None:
+            self.misses += 1
+            return None
+        result = tuple(row)
+        self._remember(key, result)
+        self._touched.add(key)
+        self.hits += 1
+        return result
+
+    def put(self, namespace: str, keyword_cleaned: str, result: MatchResult):
+        key = (namespace, keyword_cleaned)
+        self._remember(key, result)
+        if self.path is not None:
+            self._pending[key] = result
+
+    def flush(self):
+        """Writes pending entries and recency updates, then evicts down to max_entries."""
+        db = self._connect()
+        if db is None or not (self._pending or self._touched):
+            self._pending.clear()
+            self._touched.clear()
+            return
+        self._clock += 1
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, *result, self._clock) for key, result in self._pending.items()]
+            )
+            db.executemany(
+                "UPDATE matches SET used = ? WHERE namespace = ? AND keyword = ?",
+                [(self._clock, *key) for key in self._touched - self._pending.keys()]
+            )
+            excess = db.execute("SELECT COUNT(*) FROM matches").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM matches WHERE (namespace, keyword) IN"
+                    " (SELECT namespace, keyword FROM matches ORDER BY used LIMIT ?)",
+                    (excess,)
+                )
+        self._pending.clear()
+        self._touched.clear()
+
+    def clear(self):
+        """Drops every entry from both levels."""
+        self.memory.clear()
+        self._pending.clear()
+        self._touched.clear()
+        db = self._connect()
+        if db is not None:
+            with db:
+                db.execute("DELETE FROM matches")
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
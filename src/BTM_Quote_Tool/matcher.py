@@ -1,98 +1,481 @@
-from .string_utilities import string_cleaner
-from .file_operations import load_input
-from .scorer import calculate_similarity
+from .string_utilities import string_cleaner_many
+from .file_operations import iter_input, StreamWriter
+from .scorer import best_similarity, batch_similarity, ProductAttributes, PRUNE_STAGES
 from .config import load_config
+from .instrumentation import recorder, span, count
+from .match_cache import MatchCache, match_namespace
+from .index import NgramIndex
+from .store import ProductStore
+from array import array
+from collections.abc import Mapping
 from logging import Logger
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+import os
+import numpy as np
 
-def stats_filter_out(product: dict[str, tuple[str, str]], keyword: str) -> dict[str, tuple[str, str]] | None:
-    product_stats = {
-        'cong': 'cvd',
-        'thẳng': 'str',
-        'cứng': 'rig',
-        'răng cưa': 'serr',
-        'vi phẫu' : 'micro',
-        'mikro' : 'micro',
-        'cán vàng' : 'tc',
-        'tc' : 'tc',
-    }
-    filtered_product = {}
+# Keyword phrase -> attribute code looked for in the English description
+STATS_VOCABULARY = {
+    'cong': 'cvd',
+    'thẳng': 'str',
+    'cứng': 'rig',
+    'răng cưa': 'serr',
+    'vi phẫu' : 'micro',
+    'mikro' : 'micro',
+    'cán vàng' : 'tc',
+    'tc' : 'tc',
+}
 
-    avai_stats = [key for key in product_stats if key in keyword]
-    if not avai_stats:
-        return None
 
-    for key, info in product.items():
-        if all(product_stats[stat] in info[0] for stat in avai_stats):
-            filtered_product[key] = info
+def _to_bits(row_ids: Iterable[int], size: int) -> int:
+    """Bitset with bit i set for every row id i."""
+    bits = bytearray((size + 7) // 8)
+    for row_id in row_ids:
+        bits[row_id >> 3] |= 1 << (row_id & 7)
+    return int.from_bytes(bits, 'little')
 
-    return filtered_product
 
+def _from_bits(mask: int) -> list[int]:
+    """Row ids of the set bits, ascending."""
+    bits = bin(mask)[:1:-1]
+    row_ids, row_id = [], bits.find('1')
+    while row_id != -1:
+        row_ids.append(row_id)
+        row_id = bits.find('1', row_id + 1)
+    return row_ids
 
 
+def build_product_data(dataset: Mapping[str, tuple[str, str]]) -> dict[str, tuple[str, str]]:
+    """Re-keys a KLS dataset by Vietnamese description, the dict form `find_best_match` also takes."""
+    return {vn_descript: (eng_descript, code) for code, (eng_descript, vn_descript) in dataset.items()}
 
-# filter out family_names + name_tags
-def name_filter_out(product_data: dict[str, tuple], keyword: str, words_included: list[str]) -> dict[str, tuple] | None:
-    refined_options = [word for word in words_included if word in keyword]
-    if not refined_options:
-        return None
 
-    # Filter product descriptions
-    return {
-        product: stats for product, stats in product_data.items()
-        if any(word in product for word in refined_options)
-    } or None
+# Where the matcher's word lists live in config.json, the legacy section first
+WORD_LIST_KEYS = {
+    'family_names': (('data_source', 'family_name_file'), ('raw_text', 'family_name')),
+    'name_tags': (('data_source', 'name_tag_file'), ('raw_text', 'name_tag')),
+}
 
 
+class MatcherContext:
+    """What `find_best_match` needs besides the keywords, prepared once.
 
-def find_best_match(general_log : Logger, score_log : Logger, keywords: list[str], product_data: dict[str, tuple]) -> tuple[list[str], list[str]]:
-    product_codes, matched_products = [], []
+    Works on a KLS `ProductStore` (code -> (eng_descript, vn_descript)) by
+    row id: the products are the distinct Vietnamese descriptions, in
+    first-seen order, each standing for the last row using it, as
+    `build_product_data` keys them. A `build_product_data` dict is turned
+    into such a store. Loads the config and the family name / name tag
+    lists a single time and keeps, for every word and for every attribute
+    code of the stats vocabulary (cvd, str, tc...), a bitset of the
+    products whose description contains it. Filtering a keyword then ORs a
+    few word bitsets and ANDs them with the attribute ones instead of
+    testing each product against each word, which is what keeps a family
+    filter miss from scanning the whole catalog (see `select`). The vocabulary
+    defaults to `STATS_VOCABULARY`, or the "stats_vocabulary" object of the
+    config's "matcher" section. `attributes` are parsed per row id of the
+    store (see KLSUtils.attributes) and `index` is a trigram index whose
+    row ids texts contain the descriptions (see KLSUtils.index), used to
+    find the word postings; both are built here when not given. The
+    attributes and bitsets are only built once a keyword needs filtering
+    (or by `prepare`), so a run answered from the match cache skips them.
+    `word_files` are the files the given word lists were read from
+    (family_names / name_tags -> path), taken from the config when
+    omitted. Call `refresh` after editing the word lists or the store.
+    """
+
+    def __init__(self, products: ProductStore | dict[str, tuple], family_names: list[str] = None, name_tags: list[str] = None,
+                 attributes: ProductAttributes = None, config: dict = None, vocabulary: dict[str, str] = None,
+                 index: NgramIndex = None, word_files: dict[str, str | Path] = None):
+        self.config = config
+        self.word_files = {name: Path(file_path).resolve() for name, file_path in (word_files or {}).items()}
+        self.word_stamps = {}
+        if family_names is None or name_tags is None:
+            self._load_word_lists()
+        else:
+            self.family_names, self.name_tags = family_names, name_tags
+            if not self.word_files and self.config is not None:
+                self.word_files = self._config_word_files()
+            self.word_stamps = {name: self._stamp(file_path) for name, file_path in self.word_files.items()}
+        if vocabulary is None:
+            vocabulary = (self.config or {}).get('matcher', {}).get('stats_vocabulary', STATS_VOCABULARY)
+        self.vocabulary = vocabulary
+        self._set_products(products, attributes, index)
+
+    def _config_word_files(self) -> dict[str, Path]:
+        word_files = {}
+        for name, candidates in WORD_LIST_KEYS.items():
+            for section, key in candidates:
+                if key in self.config.get(section, {}):
+                    word_files[name] = Path(self.config[section][key]).resolve()
+                    break
+        return word_files
 
-    # Load configuration, family names, and name tags
-    config = load_config()
-    family_names, name_tags = load_input(config, 'data_source', 'family_name_file'), load_input(config, 'data_source', 'name_tag_file')
+    def _load_word_lists(self):
+        if not self.word_files:
+            if self.config is None:
+                self.config = load_config()
+            self.word_files = self._config_word_files()
+        for name in WORD_LIST_KEYS:
+            file_path = self.word_files.get(name)
+            self.word_stamps[name] = self._stamp(file_path) if file_path else None
+            setattr(self, name, self._read_word_list(file_path) if file_path else [])
 
-    # Process each keyword
-    for index, keyword in enumerate(keywords):
+    @staticmethod
+    def _read_word_list(file_path: Path) -> list[str]:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                return file.read().splitlines()
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            return []
 
-        keyword_cleaned = string_cleaner(keyword)
-        best_match, best_score = None, 0
+    @staticmethod
+    def _stamp(file_path: Path) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(file_path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
 
-        # Filter by family names or name tags
-        name_filtered = name_filter_out(product_data, keyword_cleaned, family_names)
-        tag_filtered = name_filter_out(product_data, keyword_cleaned, name_tags)
+    def _set_products(self, products: ProductStore | dict[str, tuple], attributes: ProductAttributes = None,
+                      index: NgramIndex = None):
+        if not isinstance(products, ProductStore):
+            products = ProductStore((code, (eng_descript, description)) for description, (eng_descript, code) in products.items())
+            attributes = index = None
+        store = self.store = products
+        self.version = store.version
+        positions, rows = {}, array('I')
+        for row_id in store.row_ids():
+            description = store.text(row_id, 1)
+            position = positions.get(description)
+            if position is None:
+                positions[description] = len(rows)
+                rows.append(row_id)
+            else:
+                rows[position] = row_id
+        self.rows = rows
+        self.descriptions = list(positions)
+        self.everything = range(len(rows))
+        self.attributes = attributes
+        self.index = index
+        self.all_bits = (1 << len(rows)) - 1
+        self.stat_bits = None
+        self._namespace = None
 
-        # Use original product_data if filtering failed
-        if tag_filtered and name_filtered:
-            final_options = {**tag_filtered, **name_filtered}
-        elif tag_filtered is not None:
-            final_options = tag_filtered
-        elif name_filtered is not None:
-            final_options = name_filtered
+    def prepare(self):
+        """Parses the attributes and builds the filter bitsets now instead of on first use."""
+        if self.stat_bits is not None:
+            return
+        store, rows = self.store, self.rows
+        if self.attributes is None:
+            self.attributes = ProductAttributes(store.text(row_id, 1) for row_id in range(len(store.codes)))
+        self._build_postings()
+        self.stat_bits = {
+            stat: _to_bits((position for position, row_id in enumerate(rows) if stat in store.text(row_id, 0)), len(rows))
+            for stat in dict.fromkeys(self.vocabulary.values())
+        }
+
+    def _build_postings(self):
+        descriptions, size = self.descriptions, len(self.descriptions)
+        if self.index is None:
+            search = NgramIndex(descriptions).search
         else:
-            final_options = product_data
-
-        temp_options = stats_filter_out(final_options, keyword_cleaned)
-        final_options = temp_options or final_options
-
-        # Calculate similarity for each product description
-        for description in final_options.keys():
-            similarity_score = calculate_similarity(keyword_cleaned, description)
-
-            if similarity_score and similarity_score > best_score:
-                best_score = similarity_score
-                best_match = description
-
-        # Append best match or "NONE" if no match is found
-        if best_match:
-            matched_products.append(best_match)
-            product_codes.append(final_options[best_match][1])  
-            general_log.info(f"INFO --> {index + 1} _product : {keyword}")
-            general_log.info(f"       after cleaned : {keyword_cleaned}")
-            general_log.info(f"     product matched : {best_match}")
-            general_log.info(f"      matching score : {best_score}")
+            # The index only narrows by trigrams, its candidates are checked against the descriptions
+            positions = {row_id: position for position, row_id in enumerate(self.rows)}
+
+            def search(words: list[str]) -> list[int]:
+                return [
+                    positions[row_id] for row_id in self.index.candidates(words)
+                    if row_id in positions and all(word in descriptions[positions[row_id]] for word in words)
+                ]
+        self.family_postings = {word: _to_bits(search([word]), size) for word in dict.fromkeys(self.family_names)}
+        self.tag_postings = {word: _to_bits(search([word]), size) for word in dict.fromkeys(self.name_tags)}
+
+    def refresh(self, products: ProductStore | dict[str, tuple] = None, attributes: ProductAttributes = None,
+                index: NgramIndex = None) -> bool:
+        """Re-reads word lists whose file changed and re-indexes new or edited products. True if anything moved."""
+        lists_changed = any(self._stamp(path) != self.word_stamps[name] for name, path in self.word_files.items())
+        if lists_changed:
+            self._load_word_lists()
+        if products is not None:
+            self._set_products(products, attributes, index)
+        elif lists_changed:
+            self._namespace = None
+            if self.stat_bits is not None:
+                self._build_postings()
+        return lists_changed or products is not None
+
+    def namespace(self) -> str:
+        """`match_namespace` of these products, word lists and vocabulary, computed once."""
+        if self._namespace is None:
+            self._namespace = match_namespace(self.products(), self.family_names, self.name_tags, self.vocabulary)
+        return self._namespace
+
+    def code(self, position: int) -> str:
+        return self.store.codes[self.rows[position]]
+
+    def products(self) -> Iterator[tuple[str, str, str]]:
+        """(vn_descript, eng_descript, code) per product, in order."""
+        store = self.store
+        for description, row_id in zip(self.descriptions, self.rows):
+            yield description, store.text(row_id, 0), store.codes[row_id]
+
+    def candidates(self, positions: Sequence[int]) -> tuple[list[str], np.ndarray]:
+        """The descriptions of the given products and their rows in `attributes`."""
+        rows = np.frombuffer(self.rows, dtype=np.uint32)
+        if positions is self.everything:
+            return self.descriptions, rows
+        descriptions = self.descriptions
+        return [descriptions[position] for position in positions], rows[np.asarray(positions, dtype=np.intp)]
+
+    @staticmethod
+    def _filter(postings: dict[str, int], keyword: str) -> int:
+        """Bitset of the products containing any of the words found in the keyword, 0 when none is."""
+        mask = 0
+        for word, bits in postings.items():
+            if word in keyword:
+                mask |= bits
+        return mask
+
+    @staticmethod
+    def _options(masks: list[int]) -> list[int]:
+        return [position for mask in masks for position in _from_bits(mask)]
+
+    def select(self, keyword_cleaned: str) -> Sequence[int]:
+        """Positions of the products worth scoring for a keyword.
+
+        The products holding a family name or a name tag found in the
+        keyword (tag hits first), or all of them when none is found,
+        narrowed to those with every attribute code the keyword's stats
+        vocabulary calls for unless that leaves nothing. Returns
+        `everything` when no filter applies.
+        """
+        self.prepare()
+        name_mask = self._filter(self.family_postings, keyword_cleaned)
+        tag_mask = self._filter(self.tag_postings, keyword_cleaned)
+
+        if recorder.enabled:
+            count('match.name_filter_hits', bool(name_mask))
+            count('match.tag_filter_hits', bool(tag_mask))
+
+        # Tag hits first, then name-only hits, as {**tag_filtered, **name_filtered} orders them
+        if tag_mask or name_mask:
+            masks = [tag_mask, name_mask & ~tag_mask] if tag_mask else [name_mask]
         else:
-            matched_products.append("NONE")
-            product_codes.append("NONE")
-            general_log.info(f"     product matched : No suitable option found.")
+            masks = None
+
+        stats = [stat for phrase, stat in self.vocabulary.items() if phrase in keyword_cleaned]
+        stat_mask = self.all_bits
+        for stat in stats:
+            stat_mask &= self.stat_bits[stat]
+        filtered = [mask & stat_mask for mask in masks or [self.all_bits]] if stats else []
+
+        if recorder.enabled:
+            count('match.stats_filter_hits', any(filtered))
+            count('match.full_catalog', not any(filtered) and masks is None)
+        if any(filtered):
+            return self._options(filtered)
+        return self.everything if masks is None else self._options(masks)
+
+
+
+# Context of the last call made without one, reused while the store is unchanged
+_reused: tuple[tuple, MatcherContext] = None
+
+
+def _context_for(products: ProductStore | dict[str, tuple], family_names: list[str] | None, name_tags: list[str] | None,
+                 attributes: ProductAttributes | None) -> MatcherContext:
+    """A context for `iter_matches` callers that pass none, kept for the next call on the same store."""
+    global _reused
+    if not isinstance(products, ProductStore):
+        return MatcherContext(products, family_names, name_tags, attributes)
+    key = (products.version, attributes, family_names and tuple(family_names), name_tags and tuple(name_tags))
+    if _reused is not None:
+        reused_key, context = _reused
+        if context.store is products and reused_key[0] == key[0] and reused_key[1] is key[1] and reused_key[2:] == key[2:]:
+            context.refresh()
+            return context
+    context = MatcherContext(products, family_names, name_tags, attributes)
+    _reused = key, context
+    return context
+
+
+def best_match_of(keyword_cleaned: str, descriptions: list[str], rows: np.ndarray = None,
+                  attributes: ProductAttributes = None) -> tuple[int | None, float]:
+    """Scores the keyword against every description, first highest score wins.
 
+    Returns the position of the best description, None when none reaches
+    80. Size and tip scores come from the pre-parsed attributes (`rows` are
+    the descriptions' rows in them) in one vectorized pass; the fuzzy
+    scores are left to `best_similarity`, which skips or cuts short the
+    pairs that cannot beat the best so far.
+    """
+    if attributes is None:
+        attributes, rows = ProductAttributes(descriptions), np.arange(len(descriptions))
+    size_scores, tip_scores = attributes.scores([keyword_cleaned], rows)
+    index, best_score, pruned = best_similarity(
+        keyword_cleaned, descriptions, size_scores[0], tip_scores[0], attributes.bounds(keyword_cleaned, rows)
+    )
+
+    if recorder.enabled:
+        for name, amount in zip(PRUNE_STAGES, pruned):
+            count(f'match.pruned_{name}', amount)
+    return index, best_score
+
+
+
+def batch_best_matches(keywords_cleaned: list[str], options_list: list[Sequence[int]], context: MatcherContext,
+                       chunk_size: int = 64) -> list[tuple[int | None, float]]:
+    """Same picks as `best_match_of`, scored with rapidfuzz's matrix API.
+
+    Keywords whose filters fell back to the whole catalog are scored
+    together in chunks, the others one row at a time against their own
+    candidates. The vectorized scores only shortlist; the scalar scorer
+    settles the shortlist so ties and rounding resolve exactly as before.
+    Returns (product position, score) per keyword.
+    """
+    results = [(None, 0)] * len(keywords_cleaned)
+    margin = 0.05
+    context.prepare()
+    attributes = context.attributes
+
+    def settle(index: int, positions: Sequence[int], scores):
+        top = scores.max() if len(scores) else 0
+        if top < 80 - margin:
+            return
+        shortlist = [positions[pos] for pos in np.flatnonzero(scores >= top - margin)]
+        best, score = best_match_of(keywords_cleaned[index], *context.candidates(shortlist), attributes)
+        results[index] = (shortlist[best] if best is not None else None, score)
+
+    full = [idx for idx, options in enumerate(options_list) if options is context.everything]
+    all_descriptions, all_rows = context.candidates(context.everything)
+    for offset in range(0, len(full), chunk_size):
+        chunk = full[offset:offset + chunk_size]
+        matrix = batch_similarity([keywords_cleaned[idx] for idx in chunk], all_descriptions, attributes, all_rows)
+        for row, idx in enumerate(chunk):
+            settle(idx, context.everything, matrix[row])
+
+    for idx, options in enumerate(options_list):
+        if options is context.everything or not options:
+            continue
+        descriptions, rows = context.candidates(options)
+        settle(idx, options, batch_similarity([keywords_cleaned[idx]], descriptions, attributes, rows)[0])
+
+    return results
+
+
+
+def iter_matches(general_log : Logger, score_log : Logger, keywords: Iterable[str], product_data: ProductStore | dict[str, tuple], start: int = 0,
+                 batch: bool = False, chunk_size: int = 64, family_names: list[str] = None, name_tags: list[str] = None,
+                 attributes: ProductAttributes = None, cache: MatchCache = None,
+                 context: MatcherContext = None) -> Iterator[tuple[int, str, str, str, float]]:
+    """Yields (index, keyword, code, match, score) per keyword, "NONE" when nothing fits.
+
+    Keywords are pulled `chunk_size` at a time, so memory stays flat however
+    long the input is. `start` is the index of the first keyword, for runs
+    resumed part way through a tender. product_data is the KLS dataset
+    (a `ProductStore`) or a `build_product_data` dict; `attributes` are
+    the pre-parsed numeric attributes of the store's rows (see
+    KLSUtils.attributes), parsed here when not given or for a dict.
+    Keywords found in `cache` skip filtering and scoring; the rest are
+    added to it. Pass a `context` to reuse its word lists and indexes
+    across calls, it then supplies product_data too. Without one, the
+    context of the previous call is reused as long as the store, its
+    attributes and the word lists are the same; a dict gets a new one.
+    """
+    if context is None:
+        context = _context_for(product_data, family_names, name_tags, attributes)
+    namespace = context.namespace() if cache is not None else None
+
+    keywords = iter(keywords)
+    index = start
+    while chunk := list(islice(keywords, chunk_size)):
+        with span('match.clean'):
+            keywords_cleaned = string_cleaner_many(chunk)
+        results = [cache.get(namespace, keyword_cleaned) for keyword_cleaned in keywords_cleaned] if cache is not None else [None] * len(chunk)
+        misses = [idx for idx, result in enumerate(results) if result is None]
+
+        if misses:
+            missed_keywords = [keywords_cleaned[idx] for idx in misses]
+            with span('match.filter'):
+                options_list = [context.select(keyword_cleaned) for keyword_cleaned in missed_keywords]
+            attributes = context.attributes
+            if recorder.enabled:
+                count('match.candidates_scored', sum(len(options) for options in options_list))
+
+            # Calculate similarity for each product description
+            with span('match.score_batch' if batch else 'match.score'):
+                if batch:
+                    best_matches = batch_best_matches(missed_keywords, options_list, context)
+                else:
+                    best_matches = []
+                    for keyword_cleaned, options in zip(missed_keywords, options_list):
+                        best, best_score = best_match_of(keyword_cleaned, *context.candidates(options), attributes)
+                        best_matches.append((options[best] if best is not None else None, best_score))
+
+            for idx, (position, best_score) in zip(misses, best_matches):
+                best_match = context.descriptions[position] if position is not None else None
+                results[idx] = (context.code(position), best_match, best_score) if best_match else ("NONE", None, 0)
+                if cache is not None:
+                    cache.put(namespace, keywords_cleaned[idx], results[idx])
+        if cache is not None:
+            cache.flush()
+        if recorder.enabled:
+            count('match.keywords', len(chunk))
+            count('match.cache_hits', len(chunk) - len(misses))
+
+        for keyword, keyword_cleaned, (code, best_match, best_score) in zip(chunk, keywords_cleaned, results):
+            # Yield best match or "NONE" if no match is found
+            if best_match:
+                general_log.info(f"INFO --> {index + 1} _product : {keyword}")
+                general_log.info(f"       after cleaned : {keyword_cleaned}")
+                general_log.info(f"     product matched : {best_match}")
+                general_log.info(f"      matching score : {best_score}")
+                yield index, keyword, code, best_match, best_score
+            else:
+                general_log.info(f"     product matched : No suitable option found.")
+                yield index, keyword, "NONE", "NONE", 0
+            index += 1
+
+
+
+def find_best_match(general_log : Logger, score_log : Logger, keywords: list[str], product_data: ProductStore | dict[str, tuple],
+                    batch: bool = False, family_names: list[str] = None, name_tags: list[str] = None,
+                    attributes: ProductAttributes = None, cache: MatchCache = None,
+                    context: MatcherContext = None) -> tuple[list[str], list[str]]:
+    product_codes, matched_products = [], []
+    for _, _, code, match, _ in iter_matches(general_log, score_log, keywords, product_data, batch=batch, family_names=family_names,
+                                             name_tags=name_tags, attributes=attributes, cache=cache, context=context):
+        product_codes.append(code)
+        matched_products.append(match)
     return product_codes, matched_products
+
+
+
+def match_file(general_log : Logger, score_log : Logger, config : object, source : str, product_data: ProductStore | dict[str, tuple],
+               input_file : str, codes_file : str, products_file : str, batch: bool = False, flush_every: int = 100,
+               family_names: list[str] = None, name_tags: list[str] = None, attributes: ProductAttributes = None,
+               cache: MatchCache = None, context: MatcherContext = None) -> int:
+    """Streams a tender file through the matcher into the codes/products outputs.
+
+    Paths come from config[source], like `load_input`. Progress is
+    checkpointed next to the codes output, so after a crash the same call
+    resumes at the first unsaved line. Returns the number of lines done.
+    """
+    input_path = Path(config[source][input_file]).resolve()
+    codes_path = Path(config[source][codes_file]).resolve()
+    stat = os.stat(input_path)
+    writer = StreamWriter(
+        {'code': codes_path, 'product': Path(config[source][products_file]).resolve()},
+        codes_path.with_name(codes_path.name + ".checkpoint"),
+        batch_size=flush_every,
+        source_stamp=[str(input_path), stat.st_size, stat.st_mtime_ns],
+    )
+    with writer:
+        keywords = islice(iter_input(config, source, input_file), writer.done, None)
+        for _, _, code, match, _ in iter_matches(general_log, score_log, keywords, product_data, start=writer.done,
+                                                 batch=batch, family_names=family_names, name_tags=name_tags, attributes=attributes,
+                                                 cache=cache, context=context):
+            writer.write(code=code, product=match)
+    return writer.done
@@ -1,9 +1,45 @@
+import atexit
 import regex
-import csv
 import os
+from functools import lru_cache
 from pathlib import Path
-from tabulate import tabulate
-from .string_utilities import string_cleaner
+from typing import Callable, Iterable
+from .string_utilities import string_cleaner_many, fold_diacritics, has_diacritics
+from .dataset import VendorDataset, IngestPool
+from .attributes import ProductAttributes
+from .instrumentation import timed
+from .render import ResultPages, write_lines
+from .store import ProductStore, RowSet
+from .selection import SelectedCodes
+
+
+_NUMBER_PATTERN = regex.compile(r'(\d+(\.\d+)?)')
+_WORD_PATTERN = regex.compile(r'([^\d\.\s]+)')
+
+
+@lru_cache(maxsize=64)
+def _keyword_pattern(keywords: tuple[str, ...]) -> regex.Pattern:
+    """One case-insensitive alternation over all keywords, longest first."""
+    alternation = "|".join(regex.escape(keyword) for keyword in sorted(set(keywords), key=len, reverse=True))
+    return regex.compile(f"({alternation})", flags=regex.IGNORECASE)
+
+
+_fold_char = lru_cache(maxsize=None)(fold_diacritics)
+
+
+def _folded_spans(pattern: regex.Pattern, text: str) -> list[tuple[int, int]]:
+    """Spans of the pattern's matches in fold_diacritics(text), as offsets into text.
+
+    Folded a character at a time, so each folded character maps back to the
+    one it came from; marks folding to nothing stay with the letter before.
+    """
+    pieces, origins = [], []
+    for position, char in enumerate(text):
+        piece = _fold_char(char)
+        pieces.append(piece)
+        origins.extend([position] * len(piece))
+    origins.append(len(text))
+    return [(origins[match.start()], origins[match.end()]) for match in pattern.finditer(''.join(pieces))]
 
 
 class Color:
@@ -16,43 +52,53 @@ class Color:
     WHITE = '\033[37m'
 
     @staticmethod
-    def wrap_text(text_input, color_code, keywords=None, whole=False):
-        # Ensure text_input is a string, as highlight might return non-string if not careful
-        text = str(text_input)
-
+    def highlighter(color_code, keywords=None, whole=False) -> Callable[[object], str]:
+        """Returns `wrap_text` with its arguments bound, for coloring many cells.
+
+        All keywords are matched by one precompiled alternation in a single
+        pass, so a keyword never matches inside the color codes added for
+        another one. Keywords without diacritics also match accented text,
+        as the search does: "keo" highlights "kéo".
+        """
         if whole:
-            return f"{color_code}{text}{Color.END}"
+            return lambda text: f"{color_code}{text}{Color.END}"
 
+        template = f"{color_code}\\g<0>{Color.END}"
         if keywords and isinstance(keywords, list) and len(keywords) > 0:
-            processed_text = text
-            for keyword in keywords:
-                if not keyword:  # Skip empty keywords
-                    continue
-                # Escape keyword for regex to treat special characters literally
-                # Use regex.IGNORECASE for case-insensitive matching
-                # Apply color_code ONLY to the matched keyword
-                processed_text = regex.sub(
-                    rf'({regex.escape(str(keyword))})',
-                    lambda match: f"{color_code}{match.group(1)}{Color.END}",
-                    processed_text,
-                    flags=regex.IGNORECASE  # Add case-insensitivity
-                )
-            return processed_text # Return text with only keywords colored
+            keywords = tuple(str(keyword) for keyword in keywords if keyword)  # Skip empty keywords
+            if not keywords:
+                return str
+            pattern = _keyword_pattern(keywords)
+            if not any(has_diacritics(keyword) for keyword in keywords):
+                return lambda text: Color._wrap_spans(str(text), pattern, color_code)
         else:
-            # This is the original Path C: if no keywords, color non-digit/dot/space sequences.
-            # You might want to reconsider if this is the desired fallback.
-            # If text should remain uncolored if no keywords, then just 'return text'
-            return regex.sub(r'([^\d\.\s]+)', lambda match: f"{color_code}{match.group(0)}{Color.END}", text)
+            # No keywords: color the non-digit/dot/space sequences
+            pattern = _WORD_PATTERN
+        return lambda text: pattern.sub(template, str(text))
+
+    @staticmethod
+    def _wrap_spans(text: str, pattern: regex.Pattern, color_code: str) -> str:
+        if text.isascii():  # folding changes nothing
+            return pattern.sub(f"{color_code}\\g<0>{Color.END}", text)
+        pieces, last = [], 0
+        for start, end in _folded_spans(pattern, text):
+            pieces += [text[last:start], color_code, text[start:end], Color.END]
+            last = end
+        pieces.append(text[last:])
+        return ''.join(pieces)
+
+    @staticmethod
+    def wrap_text(text_input, color_code, keywords=None, whole=False):
+        return Color.highlighter(color_code, keywords, whole)(text_input)
 
     @staticmethod
     def highlight(text: str) -> str:
         """Highlights numbers in MAGENTA within the text."""
-        # Ensure text is a string
-        text_str = str(text)
-        return regex.sub(r'(\d+(\.\d+)?)', lambda match: f"{Color.MAGENTA}{match.group(1)}{Color.END}", text_str)
+        return _NUMBER_PATTERN.sub(f"{Color.MAGENTA}\\g<0>{Color.END}", str(text))
 
 
 class SupportUtils:
+    _selected = None
 
     @staticmethod
     def help():
@@ -70,36 +116,38 @@ class SupportUtils:
             "10. put 'integra' at the end to search for Integra code.\n"
             "11. put 'inch' at the end to convert cm to inch.\n"
             "12. put 'refresh' to reload the data.\n"
-            "13. put 'help' to display this message."
+            "13. put 'watch' to reload the data whenever a CSV is saved.\n"
+            "14. put 'stats' to show timings per stage (start with --stats).\n"
+            "15. 'next' / 'prev' to page through results, put 'page' at the end to jump to a page.\n"
+            "16. put 'help' to display this message."
         )
 
 
+    @staticmethod
+    def selected_codes() -> SelectedCodes:
+        """The session's selected codes, opened on first use and kept in sync with selected_code.txt."""
+        if SupportUtils._selected is None:
+            SupportUtils._selected = SelectedCodes()
+            atexit.register(SupportUtils._selected.close)
+        return SupportUtils._selected
+
+
     @staticmethod
     def save(code: str):
-        """Saves selected code to a file."""
-        selected_code_file = "selected_code.txt"
+        """Saves selected code."""
         try:
-            if not os.path.exists(selected_code_file):
-                open(selected_code_file, 'w', encoding='utf-8').close()
-            
-            with open(selected_code_file, 'a', encoding='utf-8') as file:
-                    file.write(code + "\n")
+            SupportUtils.selected_codes().append(code)
         except Exception as err:
             print(f"ERROR : {err}")
     
 
     @staticmethod
     def pick(idx: str, dataset : list[list]):
-        index = int(idx)
-        selected_code_file = "selected_code.txt"
         try:
-            if not os.path.exists(selected_code_file):
-                open(selected_code_file, 'w', encoding='utf-8').close()
-            
-            with open(selected_code_file, 'a', encoding='utf-8') as file:
-                    code = dataset[index - 1][3]
-                    code = regex.search(r'\d{2}-\d{3}-\d{2}-\d{2}', code).group(0)
-                    file.write(code + "\n")
+            index = int(idx)
+            code = dataset[index - 1][3]
+            code = regex.search(r'\d{2}-\d{3}-\d{2}-\d{2}', code).group(0)
+            SupportUtils.selected_codes().append(code)
         except ValueError as err:
             print(f"ERROR : {err}. Please enter a valid number.")
         except IndexError as err:
@@ -109,28 +157,26 @@ class SupportUtils:
 
 
     @staticmethod
-    def check(data: dict[str, tuple[str, str]], mode: str = ''):
+    def check(kls: 'KLSUtils', mode: str = ''):
         """Checks the saved codes."""
-        selected_code_file = "selected_code.txt"
         try:
+            selected = SupportUtils.selected_codes()
             # clear file content
             if mode == 'clear code':
-                with open(selected_code_file, 'w', encoding='utf-8') as file:
-                    print("FILE cleared.")
+                selected.clear()
+                print("FILE cleared.")
                 return
-            
-            # open file in notepad
+
+            # selected_code.txt may have been edited outside the tool
+            selected.import_text()
+
+            # open file in notepad, then take over any edit
             if mode == "open code":
                 os.system("notepad ./selected_code.txt")
+                selected.import_text()
                 return
 
-            # Ensure file exists
-            if not os.path.exists(selected_code_file):
-                open(selected_code_file, 'w', encoding='utf-8').close()
-
-            # Read selected codes
-            with open(selected_code_file, 'r', encoding='utf-8') as file:
-                codes = file.read().splitlines()
+            codes = list(selected)
 
             # Handle empty file
             if not codes:
@@ -138,23 +184,20 @@ class SupportUtils:
                 return
 
             # Display codes
-            for index, code in enumerate(codes, start=1):
-                matching_item = next(
-                    (vietnamese for vietnamese, (_, original_code) in data.items() if original_code == code), "None"
-                )
+            for index, (code, record) in enumerate(zip(codes, kls.resolve_codes(codes)), start=1):
+                matching_item = record[1][1] if record else "None"
                 if matching_item:
                     print(f"{index} _ {Color.wrap_text(code, Color.YELLOW)} _ {Color.wrap_text(matching_item, Color.WHITE)}")
                 else:
                     print(f"{index} _ {code}")
 
-        except FileNotFoundError as err:
+        except OSError as err:
             print(f"ERROR: {err}")
 
 
     @staticmethod
     def reference(mode: str = ""):
         reference_file = 'reference.txt'
-        selected_code_file = 'selected_code.txt'
         
         try:
             # Clear reference file content
@@ -168,16 +211,15 @@ class SupportUtils:
                 os.system("notepad ./reference.txt")
                 return
 
-            # Ensure both files exist
-            for file_name in [reference_file, selected_code_file]:
-                if not os.path.exists(file_name):
-                    open(file_name, 'w', encoding='utf-8').close()
+            # Ensure the reference file exists
+            if not os.path.exists(reference_file):
+                open(reference_file, 'w', encoding='utf-8').close()
 
-            # Read contents of files
+            # Read the references, the selected codes are kept in memory
             with open(reference_file, 'r', encoding='utf-8') as ref_file:
                 lines = ref_file.read().splitlines()
-            with open(selected_code_file, 'r', encoding='utf-8') as code_file:
-                codes_avail = code_file.read().splitlines()
+            codes_avail = SupportUtils.selected_codes()
+            codes_avail.import_text()
 
             current_prd = len(codes_avail)
 
@@ -210,46 +252,83 @@ class SupportUtils:
 
     @staticmethod
     def replace(old_code: str, new_code: str):
-        selected_code_file = 'selected_code.txt'
         try:
-            with open(selected_code_file, 'r', encoding='utf-8') as file:
-                codes = file.readlines()
-            updated_codes = [
-                line.replace(old_code, new_code) if old_code in line else line 
-                for line in codes
-            ]
-            with open(selected_code_file, 'w', encoding='utf-8') as file:
-                file.writelines(updated_codes)
+            SupportUtils.selected_codes().replace(old_code, new_code)
             print(f"Old code replaced.")
         except Exception as err:
             print(f"ERROR : {err}")
 
 
-class AesculapUtils:
+class AesculapUtils(VendorDataset):
     def __init__(self):
-        self.dataset = {}
+        super().__init__()
+        self.alternative_index = {}
     
-    def DataProcess(self, file_path: Path) -> dict:
-        """Processes Aesculap CSV file into a dictionary."""
+    def DataProcess(self, file_path: Path, pool: IngestPool = None) -> ProductStore:
+        """Processes Aesculap CSV file into its ProductStore."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as csv_file:
-                csv_reader = csv.reader(csv_file)
-                next(csv_reader)
-                for row in csv_reader:
-                    code = str(row[0]).strip()
-                    description = string_cleaner(row[1]) or "No description"
-                    alternative = str(row[2]).strip()
-                    self.dataset[code] = (description, alternative)
-            return self.dataset
+            return self.load(file_path, pool)
         except Exception as e:
             print(f"Error processing Aesculap data: {e}")
 
 
+    def row_code(self, row: list[str]) -> str:
+        return str(row[0]).strip()
+
+
+    def clean_rows(self, rows: list[list[str]]) -> list[tuple[str, str]]:
+        descriptions = string_cleaner_many(row[1] for row in rows)
+        return [
+            (description or "No description", str(row[2]).strip())
+            for row, description in zip(rows, descriptions)
+        ]
+
+
+    def index_text(self, value: tuple[str, str]) -> str:
+        return value[0]
+
+
+    def index_row(self, row_id: int, code: str, value: tuple[str, str]):
+        """Maps the lowercased KLS alternative to the first Aesculap code that lists it."""
+        alternative = value[1].lower()
+        current = self.alternative_index.get(alternative)
+        if current is None or self.dataset.row_id(current) > row_id:
+            self.alternative_index[alternative] = code
+
+
+    def unindex_row(self, row_id: int, code: str, value: tuple[str, str]):
+        alternative = value[1].lower()
+        if self.alternative_index.get(alternative) != code:
+            return
+        del self.alternative_index[alternative]
+        # Hand the alternative over to the next code listing it, if any
+        dataset = self.dataset
+        for other_id in dataset.row_ids():
+            if other_id != row_id and dataset.text(other_id, 1).lower() == alternative:
+                self.alternative_index[alternative] = dataset.codes[other_id]
+                break
+
+
+    def find_alternative(self, kls_code: str) -> str | None:
+        """Returns the Aesculap code listing kls_code as its alternative."""
+        return self.alternative_index.get(kls_code.strip().lower())
+
+
+    def find_alternatives(self, kls_codes: Iterable[str]) -> list[str | None]:
+        """Bulk `find_alternative`, one entry per input code."""
+        alternative_index = self.alternative_index
+        return [alternative_index.get(code.strip().lower()) for code in kls_codes]
+
+
     
+    @timed('search.aesculap')
     def search(self, keyword: str, dataset: dict):
         try:
             temporary = {}
             keyword_list = keyword.split()
+            if dataset is self.dataset and len(self.index) == len(dataset):
+                return dataset.rows(self.search_rows(keyword_list))
+
             for code, (descript, alternative) in dataset.items():
                 if SupportUtils.all_keys_exist(keyword_list, descript):
                     temporary[code] = (descript, alternative)
@@ -259,94 +338,143 @@ class AesculapUtils:
     
 
     @staticmethod
-    def display(tempo : dict[str, tuple[str, str]], keywords: list[str] = None):
+    @timed('render.aesculap')
+    def display(tempo : dict[str, tuple[str, str]], keywords: list[str] = None, page_size: int = 50) -> ResultPages:
         try:
-            initial_data = [
+            pages = ResultPages(
+                [[code, description, alternative] for code, (description, alternative) in tempo.items()],
+                ['Idx','Code', 'Description', 'Alternative'],
                 [
-                    index + 1,  # Index of the code
-                    Color.wrap_text(code, Color.CYAN, whole=True),  # Highlight and colorize Code
-                    Color.wrap_text(description, Color.GREEN, keywords),  # Highlight and colorize Description
-                    Color.wrap_text(alternative, Color.YELLOW, None, True)  # Colorize the Alternative
-                ]
-                for index, (code, (description, alternative)) in enumerate(tempo.items())
-            ]
-            # Define the headers for the table
-            headers = ['Idx','Code', 'Description', 'Alternative']
-            print(tabulate(initial_data, headers=headers, tablefmt="fancy_grid"))
+                    Color.highlighter(Color.CYAN, whole=True),  # Colorize Code
+                    Color.highlighter(Color.GREEN, keywords),  # Highlight and colorize Description
+                    Color.highlighter(Color.YELLOW, None, True),  # Colorize the Alternative
+                ],
+                page_size
+            )
+            pages.show()
+            return pages
         except Exception as e:
             print(f"Error displaying Aesculap data: {e}")
         
 
-class IntegraUtils:
-    def __init__(self):
-        self.dataset = {}
-
-    def DataProcess(self, file_path: Path) -> dict:
+class IntegraUtils(VendorDataset):
+    def DataProcess(self, file_path: Path, pool: IngestPool = None) -> ProductStore:
         try:
-            with open(file_path, 'r', encoding='utf-8') as csv_file:
-                csv_reader = csv.reader(csv_file)
-                next(csv_reader)
-                for row in csv_reader:
-                    code = row[0]
-                    description = regex.sub(r',', ' ', str(row[1]).strip().lower())
-                    self.dataset[code] = description
+            self.load(file_path, pool)
         except Exception as e:
             print(f"Error processing Integra data: {e}")
         return self.dataset
 
 
+    def row_code(self, row: list[str]) -> str:
+        return row[0]
+
+
+    def clean_rows(self, rows: list[list[str]]) -> list[str]:
+        return [regex.sub(r',', ' ', str(row[1]).strip().lower()) for row in rows]
+
+
+    @timed('search.integra')
     def search(self, keyword: str, dataset : dict):
         try:
             keyword_list = keyword.strip().lower().split()
-            for code, description in dataset.items():
-                if SupportUtils.all_keys_exist(keyword_list, description):
-                    print(f"{Color.wrap_text(code, Color.CYAN, None, True)}\t{Color.highlight(description)}")
+            if dataset is self.dataset and len(self.index) == len(dataset):
+                matches = ((self.dataset.codes[row_id], self.dataset.text(row_id)) for row_id in self.search_rows(keyword_list))
+            else:
+                matches = (
+                    (code, description) for code, description in dataset.items()
+                    if SupportUtils.all_keys_exist(keyword_list, description)
+                )
+            write_lines(f"{Color.CYAN}{code}{Color.END}\t{Color.highlight(description)}" for code, description in matches)
         except Exception as e:
             print(f"Error searching Integra data: {e}")
 
 
-class KLSUtils:
+class KLSUtils(VendorDataset):
+    text_columns = (0, 1)
+
     def __init__(self):
-        self.dataset = {}
+        super().__init__()
+        self.code_index = {}  # lowercased -> code, for the codes that are not lowercase already
+        self.attributes = ProductAttributes()
 
-    def DataProcess(self, file_path: Path) -> dict:
+    def DataProcess(self, file_path: Path, pool: IngestPool = None) -> ProductStore:
         try:
-            with open(file_path, 'r', encoding='utf-8') as csv_file:
-                csv_reader = csv.reader(csv_file)
-                next(csv_reader)
-
-                for row in csv_reader:
-                    code = row[0].strip()
-                    eng_descript = string_cleaner(row[1])
-                    vn_descript = string_cleaner(row[2])
-
-                    self.dataset[code] = (eng_descript, vn_descript)
-            return self.dataset
+            return self.load(file_path, pool)
         except Exception as e:
             print(f"Error processing KLS data: {e}")
 
 
+    def clean_rows(self, rows: list[list[str]]) -> list[tuple[str, str]]:
+        eng_descripts = string_cleaner_many(row[1] for row in rows)
+        vn_descripts = string_cleaner_many(row[2] for row in rows)
+        return list(zip(eng_descripts, vn_descripts))
+
+
+    def index_text(self, value: tuple[str, str]) -> str:
+        return value[0] + " " + value[1]
+
+
+    def build_index(self):
+        self.attributes = ProductAttributes()
+        super().build_index()
+
+
+    def index_row(self, row_id: int, code: str, value: tuple[str, str]):
+        """Maps a code with capitals to its dataset key and parses the matcher attributes of its row."""
+        if code != code.lower():
+            self.code_index.setdefault(code.lower(), code)
+        self.attributes.set(row_id, value[1])
+
+
+    def unindex_row(self, row_id: int, code: str, value: tuple[str, str]):
+        if self.code_index.get(code.lower()) == code:
+            del self.code_index[code.lower()]
+        self.attributes.discard(row_id, value[1])
+
+
+    def lookup(self, code: str) -> str | None:
+        """Returns the dataset key for a code, ignoring case and surrounding spaces."""
+        key = code.strip().lower()
+        found = self.code_index.get(key)
+        if found is None and key in self.dataset:
+            found = key
+        return found
+
+
+    def resolve_codes(self, codes: Iterable[str]) -> list[tuple[str, tuple[str, str]] | None]:
+        """Bulk lookup: (code, (eng_descript, vn_descript)) per input code, None when unknown."""
+        dataset = self.dataset
+        resolved = []
+        for code in codes:
+            key = self.lookup(code)
+            resolved.append((key, dataset[key]) if key is not None else None)
+        return resolved
+
+
     @staticmethod
-    def display(temporary: dict, keywords: list[str] = None):
+    @timed('render.kls')
+    def display(temporary: dict, keywords: list[str] = None, page_size: int = 50) -> ResultPages:
+        """Shows the first page of results; the returned pages back 'next', 'prev' and 'get'."""
         try:
-            initial_data = [
-                 [
-                    index + 1,  # Index of the code
-                    Color.wrap_text(vn_descript, Color.GREEN, keywords),  # Highlight and colorize Vietnamese Description
-                    Color.wrap_text(eng_descript, Color.CYAN, keywords),  # Highlight and colorize English Description
-                    Color.wrap_text(code, Color.YELLOW, keywords, whole=True)  # Colorize the Code
-                ]
-                for index, (code, (eng_descript, vn_descript)) in enumerate(temporary.items())
-            ]
-            
-            headers = ['Idx',"Vietnamese Description", "English Description", "Code"]
-            print(tabulate(initial_data, headers=headers, tablefmt="fancy_grid"))
-            return initial_data
+            pages = ResultPages(
+                [[vn_descript, eng_descript, code] for code, (eng_descript, vn_descript) in temporary.items()],
+                ['Idx',"Vietnamese Description", "English Description", "Code"],
+                [
+                    Color.highlighter(Color.GREEN, keywords),  # Highlight and colorize Vietnamese Description
+                    Color.highlighter(Color.CYAN, keywords),  # Highlight and colorize English Description
+                    Color.highlighter(Color.YELLOW, keywords, whole=True),  # Colorize the Code
+                ],
+                page_size
+            )
+            pages.show()
+            return pages
         except Exception as e:
             print(f"Error displaying KLS data: {e}")
 
 
-    def SearchByCode(self, keyword: str, AesculapDataset: dict):
+    @timed('search.kls_code')
+    def SearchByCode(self, keyword: str, aesculap: 'AesculapUtils'):
         try:
             if not self.dataset:
                 print("The dataset is empty. Please process data before searching.")
@@ -355,16 +483,13 @@ class KLSUtils:
             temporary = {}
             keyword = keyword.strip().lower()  # Normalize keyword for case-insensitive matching
 
-            # Search for the keyword in self.dataset
-            for code, info in self.dataset.items():
-                if code.lower() == keyword:
-                    temporary[code] = info
+            code = self.lookup(keyword)
+            if code is not None:
+                temporary[code] = self.dataset[code]
 
-                    # Search for alternatives in AesculapDataset
-                    for aesculap_code, information in AesculapDataset.items():
-                        if len(information) > 1 and information[1].lower() == keyword:
-                            print(f"Alternative AESCULAP code: {Color.wrap_text(aesculap_code, Color.YELLOW, None, True)}")
-                            break  # Exit the loop early when a match is found
+                aesculap_code = aesculap.find_alternative(keyword)
+                if aesculap_code is not None:
+                    print(f"Alternative AESCULAP code: {Color.wrap_text(aesculap_code, Color.YELLOW, None, True)}")
             
             # Display results or notify if no matches
             self.display(temporary, keywords=[keyword]) if temporary else print("No matching code found.")
@@ -372,15 +497,11 @@ class KLSUtils:
             print(f"Error searching KLS data: {e}")
 
 
-    def search(self, keyword: str) -> dict:
+    @timed('search.kls')
+    def search(self, keyword: str) -> RowSet:
+        """Returns the matching products as a read-only code -> (eng, vn) view, in row order."""
         try:
-            matching_products = {}
             keyword_list = keyword.strip().lower().split()
-
-            for code, info in self.dataset.items():
-                total_descript = info[0] + " " + info[1]
-                if SupportUtils.all_keys_exist(keyword_list, total_descript):
-                    matching_products[code] = info
-            return matching_products
+            return self.dataset.rows(self.search_rows(keyword_list))
         except Exception as e:
             print(f"Error searching KLS data: {e}")        
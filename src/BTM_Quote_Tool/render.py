@@ -0,0 +1,77 @@
+import sys
+from typing import Callable
+
+
+class ResultPages:
+    """Search results shown one table page at a time.
+
+    Rows are kept raw and only the page on screen is colored and run through
+    tabulate, so a 3,000-hit query costs no more to show than a 50-hit one.
+    Indexing works on the whole result set, `pages[i]` is `[i + 1, *row]`,
+    so `get` picks by the Idx column whatever page it was read from.
+    """
+
+    def __init__(self, rows: list[list[str]], headers: list[str], styles: list[Callable[[str], str]], page_size: int = 50):
+        self.rows = rows
+        self.headers = headers
+        self.styles = styles
+        self.page_size = max(1, page_size)
+        self.page = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: int) -> list:
+        if index < 0:
+            index += len(self.rows)
+        if not 0 <= index < len(self.rows):
+            raise IndexError("result index out of range")
+        return [index + 1, *self.rows[index]]
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def render(self, page: int) -> str:
+        """The table for one page, with the styles applied to its rows only."""
+        from tabulate import tabulate  # slow to import, only needed once results are shown
+        start = page * self.page_size
+        table = [
+            [index, *(style(value) for style, value in zip(self.styles, row))]
+            for index, row in enumerate(self.rows[start:start + self.page_size], start=start + 1)
+        ]
+        text = tabulate(table, headers=self.headers, tablefmt="fancy_grid")
+        if self.page_count > 1:
+            text += (f"\nPage {page + 1}/{self.page_count} ({len(self.rows)} results)"
+                     " - 'next', 'prev' or '<n> page' to move.")
+        return text
+
+    def show(self, page: int = None) -> bool:
+        """Writes a page (the current one by default) in one go; False when out of range."""
+        if page is None:
+            page = self.page
+        if not 0 <= page < self.page_count:
+            return False
+        self.page = page
+        sys.stdout.write(self.render(page) + "\n")
+        sys.stdout.flush()
+        return True
+
+    def next(self) -> bool:
+        return self.show(self.page + 1)
+
+    def prev(self) -> bool:
+        return self.show(self.page - 1)
+
+
+def write_lines(lines, chunk_size: int = 256):
+    """Writes lines to stdout in chunks instead of one print per line."""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            sys.stdout.write("\n".join(buffer) + "\n")
+            buffer.clear()
+    if buffer:
+        sys.stdout.write("\n".join(buffer) + "\n")
+    sys.stdout.flush()
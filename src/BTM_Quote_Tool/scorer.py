@@ -1,7 +1,9 @@
-import re
 import sys
 from logging import Logger
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from .attributes import ProductAttributes, SIZE_PATTERN, TIP_PATTERN
+# numpy is only imported by the array scorers, `calculate_similarity` and
+# the match cache, which hashes this module's functions, go without it.
 sys.stdout.reconfigure(encoding='utf-8')
 
 
@@ -12,10 +14,8 @@ def fuzz_score(keyword: str, product: str) -> float:
     return round(weighted_score, 2)
 
 def size_matching_score(keyword: str, product: str) -> float:
-    pattern = r'(dài)\s+(\d+(\.\d+)?)\s*(mm|cm)'
-
-    key_match = re.search(pattern, keyword)
-    product_match = re.search(pattern, product)
+    key_match = SIZE_PATTERN.search(keyword)
+    product_match = SIZE_PATTERN.search(product)
 
     if not key_match or not product_match:
         return 0.0
@@ -30,10 +30,8 @@ def size_matching_score(keyword: str, product: str) -> float:
 
 
 def tip_matching_score(keyword: str, product: str) -> float:
-    pattern = r'(đầu)\s+(\d+(\.\d+)?)\s*(mm)'
-
-    key_match = re.search(pattern, keyword)
-    product_match = re.search(pattern, product)
+    key_match = TIP_PATTERN.search(keyword)
+    product_match = TIP_PATTERN.search(product)
 
     if not key_match or not product_match:
         return 0.0
@@ -46,11 +44,8 @@ def tip_matching_score(keyword: str, product: str) -> float:
     tolerance = 0.5
     return 100.0 if margin <= tolerance else max(0.0, 100.0 / (margin + 1))
 
-def calculate_similarity(keyword: str, product: str) -> float | None:
-    similarity = fuzz_score(keyword, product)
-    size_score = size_matching_score(keyword, product)
-    tip_score = tip_matching_score(keyword, product)
-
+def combine_scores(similarity: float, size_score: float, tip_score: float) -> float | None:
+    """Weights the fuzzy, size and tip scores into the final score, None below 80."""
     final_score = 0
 
     if tip_score:
@@ -62,3 +57,105 @@ def calculate_similarity(keyword: str, product: str) -> float | None:
 
     return round(final_score, 2) if final_score >= 80 else None
 
+
+# Stages of `best_similarity`, in the order they may drop a pair
+PRUNE_STAGES = ('length', 'tokens', 'token_set', 'ratio')
+
+
+def _needed_similarity(best_score: float, size_scores, tip_scores):
+    """Lowest 0.8 * token_set + 0.2 * ratio that may still beat best_score, and 80, in `combine_scores`.
+
+    Kept a couple of hundredths low so rounding never drops a winner.
+    """
+    import numpy as np
+    target = max(80.0, best_score) - 0.01
+    return np.where(
+        tip_scores > 0,
+        (target - tip_scores * 0.1 - size_scores * 0.3) / 0.6,
+        np.where(size_scores > 0, (target - size_scores * 0.3) / 0.7, target)
+    ) - 0.01
+
+
+def best_similarity(keyword: str, products: list[str], size_scores: 'np.ndarray', tip_scores: 'np.ndarray',
+                    bounds: tuple['np.ndarray', 'np.ndarray'], best_score: float = 0,
+                    chunk_size: int = 256) -> tuple[int | None, float, list[int]]:
+    """Position and score of the first product scoring highest above best_score, plus pairs pruned per stage.
+
+    Picks what `calculate_similarity` over every pair picks, but in a cascade,
+    a chunk of products at a time: pairs whose length or token-overlap upper
+    bound (`bounds`) cannot beat the best so far are dropped first, then
+    token_set_ratio runs over the chunk with the lowest score_cutoff a
+    survivor needs, and fuzz.ratio runs last, pair by pair, with the
+    score_cutoff derived from the running best. Counts follow PRUNE_STAGES.
+    """
+    import numpy as np
+    ratio_bounds, token_set_bounds = bounds
+    pruned = [0] * len(PRUNE_STAGES)
+    best_index = None
+    for start in range(0, len(products), chunk_size):
+        stop = min(start + chunk_size, len(products))
+        needed = _needed_similarity(best_score, size_scores[start:stop], tip_scores[start:stop])
+        ratio_bound = ratio_bounds[start:stop]
+        by_length = 80.0 + 0.2 * ratio_bound >= needed
+        by_tokens = by_length & (0.8 * token_set_bounds[start:stop] + 0.2 * ratio_bound >= needed)
+        positions = np.flatnonzero(by_tokens)
+        pruned[0] += len(needed) - int(by_length.sum())
+        pruned[1] += int(by_length.sum()) - len(positions)
+        if not len(positions):
+            continue
+
+        cutoffs = (needed[positions] - 0.2 * ratio_bound[positions]) / 0.8
+        token_set_scores = process.cdist(
+            [keyword], [products[start + position] for position in positions.tolist()],
+            scorer=fuzz.token_set_ratio, score_cutoff=max(0.0, float(cutoffs.min())), dtype=np.float64
+        )[0]
+        survivors = token_set_scores >= cutoffs
+        pruned[2] += len(positions) - int(survivors.sum())
+
+        for position, token_set_score in zip(positions[survivors].tolist(), token_set_scores[survivors].tolist()):
+            index = start + position
+            size_score, tip_score = float(size_scores[index]), float(tip_scores[index])
+            cutoff = (float(_needed_similarity(best_score, size_score, tip_score)) - 0.8 * token_set_score) / 0.2
+            simple_ratio_score = fuzz.ratio(keyword, products[index], score_cutoff=max(0.0, cutoff)) if cutoff <= 100 else 0.0
+            if simple_ratio_score < cutoff:
+                pruned[3] += 1
+                continue
+
+            weighted_score = (0.8 * token_set_score) + (0.2 * simple_ratio_score)
+            similarity_score = combine_scores(round(weighted_score, 2), size_score, tip_score)
+            if similarity_score and similarity_score > best_score:
+                best_index, best_score = index, similarity_score
+    return best_index, best_score, pruned
+
+
+def calculate_similarity(keyword: str, product: str, best_score: float = 0) -> float | None:
+    """Final score of the pair, None below 80 or when it cannot beat best_score."""
+    similarity = fuzz_score(keyword, product)
+    size_score = size_matching_score(keyword, product)
+    tip_score = tip_matching_score(keyword, product)
+    final_score = combine_scores(similarity, size_score, tip_score)
+    return final_score if final_score and final_score > best_score else None
+
+
+def batch_similarity(keywords: list[str], products: list[str], attributes: ProductAttributes = None,
+                     rows: 'np.ndarray' = None) -> 'np.ndarray':
+    """Scores every keyword against every product in one pass.
+
+    Returns a (keywords x products) matrix of the unrounded weights used by
+    `calculate_similarity`; the two may differ by rounding, so callers
+    confirm their pick with the scalar function. `rows` are the products'
+    rows in `attributes`; without attributes the products are parsed here.
+    """
+    import numpy as np
+    token_set = process.cdist(keywords, products, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=-1)
+    simple = process.cdist(keywords, products, scorer=fuzz.ratio, dtype=np.float64, workers=-1)
+    similarity = np.round(0.8 * token_set + 0.2 * simple, 2)
+    if attributes is None:
+        attributes, rows = ProductAttributes(products), np.arange(len(products))
+    size_score, tip_score = attributes.scores(keywords, rows)
+
+    return np.where(
+        tip_score > 0,
+        tip_score * 0.1 + similarity * 0.6 + size_score * 0.3,
+        np.where(size_score > 0, size_score * 0.3 + similarity * 0.7, similarity)
+    )
@@ -0,0 +1,217 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+import regex
+
+CODE_PATTERN = regex.compile(r'\d{2}-\d{3}-\d{2}-\d{2}')
+
+
+class SelectedCodes:
+    """The codes picked during a quoting session, in pick order.
+
+    Lines live in memory, with an index from every code they contain to
+    their positions, and each change is one JSON line appended to
+    `journal_path`: ["+", line] for a pick, ["~", old, new] for a replace,
+    which the next start replays. Appends are flushed at once but fsynced
+    every `sync_every` changes and on `close`; a line torn by a crash is
+    dropped on replay. Once the journal holds more than `compact_ratio`
+    records per line it is rewritten to one record per line and swapped in
+    atomically. The plain selected_code.txt follows along: a pick adds its
+    line to the end, a replace or clear rewrites it through `export`.
+    Edits made to it by hand are taken in by `import_text`, which callers
+    run before reading the picks, at start when the file is newer than the
+    journal (a session without a journal starts from it) and on `close`.
+    """
+
+    def __init__(self, journal_path: Path = 'selected_code.journal', text_path: Path = 'selected_code.txt',
+                 sync_every: int = 32, compact_ratio: float = 2.0):
+        self.journal_path = Path(journal_path)
+        self.text_path = Path(text_path)
+        self.sync_every = sync_every
+        self.compact_ratio = compact_ratio
+        self.lines: list[str] = []
+        self.positions: dict[str, set[int]] = {}
+        self.records = 0
+        self.pending = 0
+        self.file = None
+        if self.journal_path.exists():
+            self._replay()
+            self.file = open(self.journal_path, 'a', encoding='utf-8')
+            try:
+                edited = self.text_path.stat().st_mtime_ns > self.journal_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                edited = False
+            if edited:
+                self.import_text()
+            else:
+                self.export()  # also catches up on a pick journaled right before a crash
+        else:
+            self._set_lines(self._read_text() or [])
+            self.compact()
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __getitem__(self, position: int) -> str:
+        return self.lines[position]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.lines)
+
+    def _index(self, position: int):
+        for code in set(CODE_PATTERN.findall(self.lines[position], overlapped=True)):
+            self.positions.setdefault(code, set()).add(position)
+
+    def _unindex(self, position: int):
+        for code in set(CODE_PATTERN.findall(self.lines[position], overlapped=True)):
+            self.positions[code].discard(position)
+            if not self.positions[code]:
+                del self.positions[code]
+
+    def _set_lines(self, lines: list[str]):
+        self.lines = []
+        self.positions = {}
+        for line in lines:
+            self._apply(['+', line])
+
+    def _apply(self, record: list[str]) -> int:
+        if record[0] == '+':
+            self.lines.append(record[1])
+            self._index(len(self.lines) - 1)
+            return 1
+        if record[0] == '~':
+            return self._replace(record[1], record[2])
+        raise ValueError(f"unknown journal record {record!r}")
+
+    def _replace(self, old: str, new: str) -> int:
+        if CODE_PATTERN.fullmatch(old):
+            positions = sorted(self.positions.get(old, ()))
+        else:
+            positions = [position for position, line in enumerate(self.lines) if old in line]
+        for position in positions:
+            self._unindex(position)
+            self.lines[position] = self.lines[position].replace(old, new)
+            self._index(position)
+        return len(positions)
+
+    def _replay(self):
+        """Rebuilds the lines from the journal, cutting it after the last whole record."""
+        good = 0
+        with open(self.journal_path, 'rb') as file:
+            for raw in file:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("torn record")
+                    self._apply(json.loads(raw))
+                except (ValueError, IndexError, TypeError):
+                    break
+                good += len(raw)
+                self.records += 1
+        if good != self.journal_path.stat().st_size:
+            with open(self.journal_path, 'r+b') as file:
+                file.truncate(good)
+
+    def _read_text(self) -> list[str] | None:
+        try:
+            with open(self.text_path, 'r', encoding='utf-8') as file:
+                return file.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+    def _append_text(self, line: str):
+        """Adds one line at the end of the text file without rewriting it."""
+        with open(self.text_path, 'a+b') as file:
+            end = file.seek(0, os.SEEK_END)
+            if end:
+                file.seek(end - 1)
+                if file.read(1) != b"\n":
+                    line = os.linesep + line  # the last line was left open by an editor
+            file.write((line + os.linesep).encode('utf-8'))
+
+    def _log(self, record: list[str]):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.records += 1
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+            if self.records > self.compact_ratio * len(self.lines) + self.sync_every:
+                self.compact()
+
+    def append(self, line: str):
+        self._apply(['+', line])
+        self._log(['+', line])
+        self._append_text(line)
+
+    def replace(self, old: str, new: str) -> int:
+        """Replaces old by new in every line containing it, returns how many lines changed."""
+        self.import_text()  # the text file is about to be rewritten, keep its edits
+        changed = self._replace(old, new)
+        if changed:
+            self._log(['~', old, new])
+            self.export()
+        return changed
+
+    def clear(self):
+        self._set_lines([])
+        self.compact()
+        self.export()
+
+    def sync(self):
+        if self.file is not None and self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def compact(self):
+        """Rewrites the journal as one record per line, replacing the old one atomically."""
+        temp = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as file:
+            for line in self.lines:
+                file.write(json.dumps(['+', line], ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        if self.file is not None:
+            self.file.close()
+        os.replace(temp, self.journal_path)
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+        self.records = len(self.lines)
+        self.pending = 0
+
+    def export(self, text_path: Path = None):
+        """Writes the lines to the plain text file, one per line."""
+        target = Path(text_path or self.text_path)
+        temp = target.with_name(target.name + ".tmp")
+        with open(temp, 'w', encoding='utf-8') as file:
+            file.writelines(line + "\n" for line in self.lines)
+        os.replace(temp, target)
+
+    def import_text(self, text_path: Path = None) -> bool:
+        """Takes the text file's lines, e.g. after editing it by hand. True if they differed.
+
+        A missing file is written again from the picks instead.
+        """
+        if text_path is not None:
+            self.text_path = Path(text_path)
+        lines = self._read_text()
+        if lines is None:
+            self.export()
+            return False
+        if lines == self.lines:
+            return False
+        self._set_lines(lines)
+        self.compact()
+        return True
+
+    def close(self):
+        if self.file is None:
+            return
+        self.import_text()
+        self.sync()
+        if self.records > len(self.lines):
+            self.compact()
+        self.export()
+        self.file.close()
+        self.file = None
@@ -0,0 +1,71 @@
+import hashlib
+import io
+import os
+import pickle
+from pathlib import Path
+
+# Bump whenever the shape of a loader's attributes changes
+SNAPSHOT_VERSION = 10
+
+
+def snapshot_path(file_path: Path) -> Path:
+    """The snapshot lives next to its CSV, e.g. KLS_PRODUCT.csv.snapshot."""
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + ".snapshot")
+
+
+def file_digest(file_path: Path) -> str:
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def file_fingerprint(file_path: Path) -> tuple[int, int, str]:
+    """Returns (size, mtime_ns, sha256) of a file."""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, file_digest(file_path)
+
+
+def load_snapshot(file_path: Path, owner: object) -> bool:
+    """Restores owner's attributes from the snapshot of file_path.
+
+    A snapshot is valid when the CSV still has the recorded size and either
+    the same mtime or, after a touch, the same content hash. Returns False
+    when there is nothing usable and the CSV has to be parsed.
+    """
+    try:
+        with open(snapshot_path(file_path), 'rb') as file:
+            data = io.BytesIO(file.read())
+        version, kind, size, mtime_ns, digest = pickle.load(data)
+        stat = os.stat(file_path)
+        if version != SNAPSHOT_VERSION or kind != type(owner).__name__ or size != stat.st_size:
+            return False
+        if mtime_ns != stat.st_mtime_ns and digest != file_digest(file_path):
+            return False
+        vars(owner).update(pickle.load(data))
+        return True
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError, AttributeError):
+        return False
+
+
+def save_snapshot(file_path: Path, owner: object, fingerprint: tuple[int, int, str]):
+    """Writes owner's attributes next to file_path, replacing any older snapshot.
+
+    fingerprint is taken before parsing, so an edit made meanwhile leaves a
+    snapshot that no longer validates instead of one that hides the edit.
+    """
+    target = snapshot_path(file_path)
+    temp = target.with_name(target.name + ".tmp")
+    try:
+        size, mtime_ns, digest = fingerprint
+        with open(temp, 'wb') as file:
+            pickle.dump((SNAPSHOT_VERSION, type(owner).__name__, size, mtime_ns, digest), file, pickle.HIGHEST_PROTOCOL)
+            # Underscored attributes are session state, e.g. caches
+            state = {name: value for name, value in vars(owner).items() if not name.startswith('_')}
+            pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, target)
+    except OSError:
+        # The snapshot only speeds up the next start, never fail a load over it
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
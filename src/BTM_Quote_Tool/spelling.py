@@ -0,0 +1,101 @@
+import re
+from typing import Iterable
+
+WORD_PATTERN = re.compile(r'[^\W\d_]{3,}')
+
+
+class SpellIndex:
+    """Vocabulary of description words for "did you mean" suggestions.
+
+    SymSpell style: each word is filed under every string obtained by
+    deleting up to `max_distance` characters from its first
+    `prefix_length` characters. A lookup generates the same deletes for the
+    misspelled word, so the candidates are a few dict hits, verified with
+    the Damerau-Levenshtein (OSA) distance. Words keep a count of the texts
+    using them; a word whose count drops to zero is skipped, not unfiled.
+    """
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.counts: dict[str, int] = {}
+        self.deletes: dict[str, list[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(1 for count in self.counts.values() if count > 0)
+
+    def __contains__(self, word: str) -> bool:
+        return self.counts.get(word, 0) > 0
+
+    def _variants(self, word: str) -> set[str]:
+        """The word's prefix and its deletes of up to max_distance characters."""
+        variants = frontier = {word[:self.prefix_length]}
+        for _ in range(self.max_distance):
+            frontier = {variant[:idx] + variant[idx + 1:] for variant in frontier for idx in range(len(variant))}
+            variants = variants | frontier
+        return variants
+
+    def add_text(self, text: str):
+        for word in WORD_PATTERN.findall(text):
+            self.add(word)
+
+    def remove_text(self, text: str):
+        for word in WORD_PATTERN.findall(text):
+            if self.counts.get(word, 0) > 0:
+                self.counts[word] -= 1
+
+    def add(self, word: str):
+        count = self.counts.get(word)
+        self.counts[word] = (count or 0) + 1
+        if count is None:
+            deletes = self.deletes
+            for variant in self._variants(word):
+                filed = deletes.get(variant)
+                if filed is None:
+                    deletes[variant] = [word]
+                else:
+                    filed.append(word)
+
+    def lookup(self, word: str, limit: int = 3) -> list[tuple[str, int, int]]:
+        """Closest known words as (word, distance, count), nearest then most used first."""
+        from rapidfuzz.distance import OSA
+        if word in self:
+            return [(word, 0, self.counts[word])]
+        counts, max_distance = self.counts, self.max_distance
+        candidates = set()
+        for variant in self._variants(word):
+            candidates.update(self.deletes.get(variant, ()))
+        results = []
+        for candidate in candidates:
+            if counts[candidate] <= 0 or abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = OSA.distance(word, candidate, score_cutoff=max_distance)
+            if distance <= max_distance:
+                results.append((candidate, distance, counts[candidate]))
+        results.sort(key=lambda result: (result[1], -result[2], result[0]))
+        return results[:limit]
+
+
+def suggest(word: str, indexes: Iterable[SpellIndex], limit: int = 3) -> list[tuple[str, int, int]]:
+    """`SpellIndex.lookup` over several vocabularies, counts summed per word."""
+    merged = {}
+    for index in indexes:
+        for candidate, distance, count in index.lookup(word, limit):
+            _, total = merged.get(candidate, (distance, 0))
+            merged[candidate] = (distance, total + count)
+    results = [(candidate, distance, count) for candidate, (distance, count) in merged.items()]
+    results.sort(key=lambda result: (result[1], -result[2], result[0]))
+    return results[:limit]
+
+
+def correct_query(keyword: str, indexes: Iterable[SpellIndex]) -> str | None:
+    """The keyword with each unknown word replaced by its best suggestion, None when nothing changed."""
+    indexes = list(indexes)
+    words, changed = keyword.split(), False
+    for position, word in enumerate(words):
+        if not WORD_PATTERN.fullmatch(word) or any(word in index for index in indexes):
+            continue
+        suggestions = suggest(word, indexes, 1)
+        if suggestions:
+            words[position], changed = suggestions[0][0], True
+    return " ".join(words) if changed else None
@@ -0,0 +1,242 @@
+import pickle
+import struct
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping, MutableMapping
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator
+
+
+class TextColumn:
+    """Strings of one column back to back in a UTF-8 buffer, with each row's (start, end).
+
+    A replaced string is appended to the buffer and its row pointed at it,
+    the old bytes are simply no longer referenced.
+    """
+    __slots__ = ('blob', 'spans')
+
+    def __init__(self, blob, spans):
+        self.blob = blob    # bytearray, or a memoryview into shared memory
+        self.spans = spans  # array('Q') or memoryview cast to 'Q', two entries per row
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> 'TextColumn':
+        column = cls(bytearray(), array('Q'))
+        for text in texts:
+            column.append(text)
+        return column
+
+    def __len__(self) -> int:
+        return len(self.spans) // 2
+
+    def __getitem__(self, row_id: int) -> str:
+        spans = self.spans
+        return str(self.blob[spans[2 * row_id]:spans[2 * row_id + 1]], 'utf-8')
+
+    def append(self, text: str):
+        start = len(self.blob)
+        self.blob += text.encode('utf-8')
+        self.spans.extend((start, len(self.blob)))
+
+    def set(self, row_id: int, text: str):
+        start = len(self.blob)
+        self.blob += text.encode('utf-8')
+        self.spans[2 * row_id], self.spans[2 * row_id + 1] = start, len(self.blob)
+
+
+class ProductStore(MutableMapping):
+    """Columnar store of a vendor dataset, what the loaders keep their rows in.
+
+    Codes and every description column are each one contiguous UTF-8
+    buffer indexed by row id, and codes are found through a sorted array of
+    the live row ids, so a dataset is a handful of buffers instead of a str
+    per cell, a tuple per row and a dict. It reads like the dict it
+    replaces: same keys, values and order, a tuple per row (or a str for
+    single-column datasets like Integra). Strings are decoded on access, a
+    code lookup is a binary search. New codes get the next row id, a
+    replaced row keeps its id and a deleted one leaves its id unused, so
+    row ids stay aligned with the loader's `codes` and trigram index.
+    `version` goes up on every change, for caches built from the store.
+    """
+    version = 0
+
+    def __init__(self, dataset: Mapping | Iterable[tuple[str, object]] = ()):
+        self.scalar = None  # set by the first row
+        self.codes = TextColumn.build(())
+        self.columns: list[TextColumn] = []
+        self.removed: set[int] = set()
+        self._shared = None
+        codes = []
+        for code, value in (dataset.items() if isinstance(dataset, Mapping) else dataset):
+            self._append(code, value)
+            codes.append(code)
+        self.order = array('I', sorted(range(len(codes)), key=codes.__getitem__))
+
+    def _cells(self, value) -> tuple[str, ...]:
+        return (value,) if self.scalar else value
+
+    def _append(self, code: str, value) -> int:
+        if self.scalar is None:
+            self.scalar = isinstance(value, str)
+            self.columns = [TextColumn.build(()) for _ in self._cells(value)]
+        self.codes.append(code)
+        for column, text in zip(self.columns, self._cells(value)):
+            column.append(text)
+        return len(self.codes) - 1
+
+    def _position(self, code: str) -> int:
+        """Where the code is, or would go, in `order`."""
+        return bisect_left(self.order, code, key=self.codes.__getitem__)
+
+    def _writable(self):
+        if self._shared is not None:
+            raise TypeError("a ProductStore attached to shared memory is read-only")
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self) -> Iterator[str]:
+        codes = self.codes
+        return (codes[row_id] for row_id in self.row_ids())
+
+    def row_ids(self) -> Iterator[int]:
+        """Row ids of the rows in the store, ascending."""
+        removed = self.removed
+        return (row_id for row_id in range(len(self.codes)) if row_id not in removed)
+
+    def row_id(self, code: str) -> int | None:
+        """Binary search of the code, None when absent."""
+        position = self._position(code)
+        if position < len(self.order) and self.codes[self.order[position]] == code:
+            return self.order[position]
+        return None
+
+    def __contains__(self, code) -> bool:
+        return isinstance(code, str) and self.row_id(code) is not None
+
+    def __getitem__(self, code: str):
+        row_id = self.row_id(code) if isinstance(code, str) else None
+        if row_id is None:
+            raise KeyError(code)
+        return self.row(row_id)
+
+    def __setitem__(self, code: str, value):
+        self._writable()
+        self.version += 1
+        row_id = self.row_id(code)
+        if row_id is None:
+            row_id = self._append(code, value)
+            insort(self.order, row_id, key=self.codes.__getitem__)
+        else:
+            for column, text in zip(self.columns, self._cells(value)):
+                column.set(row_id, text)
+
+    def __delitem__(self, code: str):
+        self._writable()
+        row_id = self.row_id(code)
+        if row_id is None:
+            raise KeyError(code)
+        self.version += 1
+        del self.order[self._position(code)]
+        self.removed.add(row_id)
+
+    def row(self, row_id: int):
+        if self.scalar:
+            return self.columns[0][row_id]
+        return tuple(column[row_id] for column in self.columns)
+
+    def text(self, row_id: int, column: int = 0) -> str:
+        return self.columns[column][row_id]
+
+    def rows(self, row_ids: Iterable[int]) -> 'RowSet':
+        return RowSet(self, row_ids)
+
+    def items(self):
+        codes, row = self.codes, self.row
+        return [(codes[row_id], row(row_id)) for row_id in self.row_ids()]
+
+    def values(self):
+        row = self.row
+        return [row(row_id) for row_id in self.row_ids()]
+
+    def export_shared(self) -> SharedMemory:
+        """Copies the store into a new shared memory block; pass `.name` to `attach`.
+
+        Row ids are kept as they are. The caller owns the block and must
+        `close()` and `unlink()` it.
+        """
+        parts = [self.order.tobytes(), array('I', sorted(self.removed)).tobytes()]
+        for column in [self.codes, *self.columns]:
+            parts += [bytes(column.blob), column.spans.tobytes()]
+        header = pickle.dumps((self.scalar, [len(part) for part in parts]))
+        shared = SharedMemory(create=True, size=8 + len(header) + sum(map(len, parts)))
+        shared.buf[:8] = struct.pack('<Q', len(header))
+        shared.buf[8:8 + len(header)] = header
+        position = 8 + len(header)
+        for part in parts:
+            shared.buf[position:position + len(part)] = part
+            position += len(part)
+        return shared
+
+    @classmethod
+    def attach(cls, name: str) -> 'ProductStore':
+        """Opens a store exported by another process, read-only; nothing is copied or decoded up front."""
+        shared = _open_shared(name)
+        (header_size,) = struct.unpack('<Q', shared.buf[:8])
+        scalar, sizes = pickle.loads(shared.buf[8:8 + header_size])
+        views, position = [], 8 + header_size
+        for size in sizes:
+            views.append(shared.buf[position:position + size])
+            position += size
+        store = cls()
+        store.scalar = scalar
+        store.order = views[0].cast('I')
+        store.removed = set(views[1].cast('I'))
+        columns = [TextColumn(views[index], views[index + 1].cast('Q')) for index in range(2, len(views), 2)]
+        store.codes, store.columns = columns[0], columns[1:]
+        store._shared = shared  # keeps the mapping alive as long as the store
+        return store
+
+
+def _open_shared(name: str) -> SharedMemory:
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:
+        # Before 3.13 attaching registers the block with the resource tracker.
+        # Pool workers share their parent's tracker, which forgets the block
+        # again when the exporter unlinks it.
+        return SharedMemory(name)
+
+
+class RowSet(Mapping):
+    """Search result as row ids over a `ProductStore`, read like a dict of the hits.
+
+    Nothing is copied: keys and values are decoded from the store when
+    iterated, in row id order.
+    """
+
+    def __init__(self, store: ProductStore, row_ids: Iterable[int]):
+        self.store = store
+        self.row_ids = row_ids if isinstance(row_ids, list) else list(row_ids)
+        self._members = None
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def __iter__(self) -> Iterator[str]:
+        codes = self.store.codes
+        return (codes[row_id] for row_id in self.row_ids)
+
+    def __contains__(self, code) -> bool:
+        if self._members is None:
+            self._members = set(self)
+        return code in self._members
+
+    def __getitem__(self, code: str):
+        if code not in self:
+            raise KeyError(code)
+        return self.store[code]
+
+    def items(self):
+        codes, row = self.store.codes, self.store.row
+        return [(codes[row_id], row(row_id)) for row_id in self.row_ids]
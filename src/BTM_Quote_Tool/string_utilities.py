@@ -1,4 +1,7 @@
 import re
+import unicodedata
+from typing import Iterable
+from .attributes import SIZE_PATTERN, TIP_FORMAT_PATTERN, BOX_FORMAT_PATTERN
 
 # special cases of substrings
 substring_replacements = {
@@ -27,22 +30,38 @@ def all_keywords_exist(keywords: list, check_string: str) -> bool:
 
 
 
+# Normalized once at import; order matters, a replacement can feed a later one
+_replacement_table = [
+    (re.sub(r'\s+', ' ', original).strip().lower(), re.sub(r'\s+', ' ', sub).strip().lower())
+    for original, sub in substring_replacements.items()
+]
+# Single pass telling whether any replacement applies at all
+_replacement_gate = re.compile('|'.join(re.escape(original) for original, _ in _replacement_table))
+
+_code_pattern = re.compile(r'\d{2}-\d{3}-\d{2}-\d{2}')
+_text_strip_pattern = re.compile(r'[^\w\.\\\/°]')
+_short_code_strip_pattern = re.compile(r'[^\w\.\\\/-]')
+_code_strip_pattern = re.compile(r'[^\w-]')
+_whitespace_pattern = re.compile(r'\s+')
+_combining_pattern = re.compile(r'[\u0300-\u036f]')
+_stroke_table = str.maketrans('đĐ', 'dD')
+
+
 def string_cleaner(text: str) -> str:
-    text = str(text)
     """Cleans and standardizes input text for comparison."""
-    if not re.search(r'\d{2}-\d{3}-\d{2}-\d{2}', text):
-        text = re.sub(r'[^\w\.\\\/°]', ' ', text).strip()             # Remove special characters
+    text = str(text)
+    if not _code_pattern.search(text):
+        text = _text_strip_pattern.sub(' ', text).strip()             # Remove special characters
     elif len(text) <= 10 or "load" in text:
-         text = re.sub(r'[^\w\.\\\/-]', ' ', text).strip()  
+        text = _short_code_strip_pattern.sub(' ', text).strip()
     else:
-        text = re.sub(r'[^\w-]', ' ', text).strip() 
-    text = re.sub(r'\s+', ' ', text).strip().lower()               # Normalize whitespace and case
-    
+        text = _code_strip_pattern.sub(' ', text).strip()
+    text = _whitespace_pattern.sub(' ', text).strip().lower()               # Normalize whitespace and case
+
     # Apply substring replacements
-    for original, sub in substring_replacements.items():
-        original_text = re.sub(r'\s+', ' ', original).strip().lower()
-        replacement = re.sub(r'\s+', ' ', sub).strip().lower()
-        text = text.replace(original_text, replacement) if original_text in text else text
+    if _replacement_gate.search(text):
+        for original_text, replacement in _replacement_table:
+            text = text.replace(original_text, replacement) if original_text in text else text
 
     # stats format
     text = size_format(text)
@@ -52,10 +71,24 @@ def string_cleaner(text: str) -> str:
     return text
 
 
+def fold_diacritics(text: str) -> str:
+    """Strips tone and vowel marks, NFC result: 'kẹp phẫu tích' -> 'kep phau tich'."""
+    stripped = _combining_pattern.sub('', unicodedata.normalize('NFD', text))
+    return unicodedata.normalize('NFC', stripped.translate(_stroke_table))
+
+
+def has_diacritics(text: str) -> bool:
+    return fold_diacritics(text) != unicodedata.normalize('NFC', text)
+
+
+def string_cleaner_many(texts: Iterable[str]) -> list[str]:
+    """Cleans a batch of texts, e.g. a CSV column."""
+    cleaner = string_cleaner
+    return [cleaner(text) for text in texts]
+
+
 def size_format(input_str: str) -> str:
-    pattern = r'(dài)\s+(\d+(\.\d+)?)\s*(mm|cm)'  # Pattern to match sizes with units (mm or cm)
-    match = re.search(pattern, input_str)
-    if not match:
+    if 'dài' not in input_str:
         return input_str  # Return the original string if no match is found
 
     def mm_to_cm(match):
@@ -69,24 +102,16 @@ def size_format(input_str: str) -> str:
         return f"dài {cm_value:.1f} cm" if cm_value % 1 else f"{int(cm_value)} cm"
 
     # Substitute matches with the converted value
-    result = re.sub(pattern, mm_to_cm, input_str)
-    return result
+    return SIZE_PATTERN.sub(mm_to_cm, input_str)
 
 
 def tip_format(text: str) -> str:
-    pattern = r'(đầu|kích thước)\s+(\d+(\.\d+)?)\s*(mm)'
-    match = re.search(pattern, text)
-    if not match:
+    if 'đầu' not in text and 'kích thước' not in text:
         return text
-    modified_text = re.sub(pattern, r'\1 \2 \4', text)
-    return modified_text
+    return TIP_FORMAT_PATTERN.sub(r'\1 \2 \4', text)
 
 
 def box_format(text : str) -> str:
-    pattern = r'(\d{3})\s*x\s*(\d{3})\s*x\s*(\d{2})\s*(mm)'
-    match = re.search(pattern, text)
-    if not match:
+    if 'x' not in text:
         return text
-
-    modified_text = re.sub(pattern, r'\1x\2x\3 \4', text)
-    return modified_text
\ No newline at end of file
+    return BOX_FORMAT_PATTERN.sub(r'\1x\2x\3 \4', text)
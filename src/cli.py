@@ -0,0 +1,222 @@
+"""Non-interactive front end for scripts.
+
+Every subcommand reads its queries from the arguments, from --file (one
+per line, repeatable) or from stdin, loads the datasets it needs once and
+writes one record per result as NDJSON (default) or CSV, without colors:
+
+    python cli.py search "kéo mayo cong" "kẹp phẫu tích"
+    python cli.py lookup-code -f codes.txt --format csv -o codes.csv
+    cat tender.txt | python cli.py match --cache match_cache.sqlite
+    python cli.py convert 12-302-20-07
+    python cli.py integra forceps --limit 20
+"""
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from BTM_Quote_Tool import load_config, string_cleaner, AesculapUtils, IntegraUtils, KLSUtils, MatchCache
+from BTM_Quote_Tool.matcher import MatcherContext, iter_matches
+
+base_dir = os.path.abspath(os.path.dirname(__file__))
+
+FIELDS = {
+    'search': ['query', 'code', 'vn_descript', 'eng_descript'],
+    'lookup-code': ['query', 'found', 'code', 'vn_descript', 'eng_descript', 'aesculap'],
+    'match': ['query', 'code', 'match', 'score'],
+    'convert': ['query', 'found', 'aesculap', 'description'],
+    'integra': ['query', 'code', 'description'],
+}
+
+
+class Datasets:
+    """Loads each vendor dataset on first use, once per process."""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self._loaded = {}
+
+    def _load(self, name: str, loader_class, key: str):
+        if name not in self._loaded:
+            loader = loader_class()
+            # Loaders report progress and errors with print, keep stdout for records
+            with contextlib.redirect_stdout(sys.stderr):
+                loader.DataProcess(Path(base_dir) / self.config['csv_source'][key])
+            self._loaded[name] = loader
+        return self._loaded[name]
+
+    @property
+    def kls(self) -> KLSUtils:
+        return self._load('kls', KLSUtils, 'kls_product_csv')
+
+    @property
+    def aesculap(self) -> AesculapUtils:
+        return self._load('aesculap', AesculapUtils, 'aesculap_product_csv')
+
+    @property
+    def integra(self) -> IntegraUtils:
+        return self._load('integra', IntegraUtils, 'integra_product_csv')
+
+
+def iter_queries(args) -> Iterator[str]:
+    """Queries from the arguments, then --file, then stdin when neither gave any."""
+    yield from args.queries
+    for file_name in args.file or ():
+        with (sys.stdin if file_name == '-' else open(file_name, 'r', encoding='utf-8')) as file:
+            for line in file:
+                if line.strip():
+                    yield line.rstrip('\n')
+    if not args.queries and not args.file:
+        for line in sys.stdin:
+            if line.strip():
+                yield line.rstrip('\n')
+
+
+def word_list_path(config: dict, key: str) -> Path:
+    return Path(base_dir) / config['raw_text'][key]
+
+
+def read_word_list(config: dict, key: str) -> list[str]:
+    file_path = word_list_path(config, key)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read().splitlines()
+    except FileNotFoundError:
+        print(f"warning: {file_path} not found, matching without the {key} filter", file=sys.stderr)
+        return []
+
+
+def run_search(datasets: Datasets, queries: Iterable[str], args) -> Iterator[dict]:
+    kls = datasets.kls
+    for query in queries:
+        for count, (code, (eng_descript, vn_descript)) in enumerate(kls.search(string_cleaner(query)).items()):
+            if args.limit and count >= args.limit:
+                break
+            yield {'query': query, 'code': code, 'vn_descript': vn_descript, 'eng_descript': eng_descript}
+
+
+def run_lookup_code(datasets: Datasets, queries: Iterable[str], args) -> Iterator[dict]:
+    kls, aesculap = datasets.kls, datasets.aesculap
+    for query in queries:
+        code = kls.lookup(query)
+        eng_descript, vn_descript = kls.dataset[code] if code is not None else (None, None)
+        yield {
+            'query': query, 'found': code is not None, 'code': code, 'vn_descript': vn_descript,
+            'eng_descript': eng_descript, 'aesculap': aesculap.find_alternative(query),
+        }
+
+
+def matcher_context(config: dict, kls: KLSUtils) -> MatcherContext:
+    """Matcher context over the KLS dataset, with the word lists named in the config's raw_text section."""
+    return MatcherContext(
+        kls.dataset, read_word_list(config, 'family_name'), read_word_list(config, 'name_tag'), kls.attributes,
+        config=config, index=kls.index,
+        word_files={'family_names': word_list_path(config, 'family_name'), 'name_tags': word_list_path(config, 'name_tag')},
+    )
+
+
+def run_match(datasets: Datasets, queries: Iterable[str], args) -> Iterator[dict]:
+    kls = datasets.kls
+    log = logging.getLogger('cli.match')
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+    config = datasets.config
+    cache = MatchCache(args.cache) if args.cache else None
+    context = matcher_context(config, kls)
+    try:
+        for _, query, code, match, score in iter_matches(log, log, queries, None, batch=args.batch, cache=cache, context=context):
+            yield {'query': query, 'code': code, 'match': match, 'score': score}
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def run_convert(datasets: Datasets, queries: Iterable[str], args) -> Iterator[dict]:
+    aesculap = datasets.aesculap
+    for query in queries:
+        code = aesculap.find_alternative(query)
+        yield {
+            'query': query, 'found': code is not None, 'aesculap': code,
+            'description': aesculap.dataset[code][0] if code is not None else None,
+        }
+
+
+def run_integra(datasets: Datasets, queries: Iterable[str], args) -> Iterator[dict]:
+    integra = datasets.integra
+    for query in queries:
+        keyword_list = query.strip().lower().split()
+        for count, row_id in enumerate(integra.search_rows(keyword_list)):
+            if args.limit and count >= args.limit:
+                break
+            yield {'query': query, 'code': integra.dataset.codes[row_id].strip(), 'description': integra.dataset.text(row_id)}
+
+
+COMMANDS = {
+    'search': (run_search, "search KLS products by keywords"),
+    'lookup-code': (run_lookup_code, "look KLS codes up, with their Aesculap alternative"),
+    'match': (run_match, "best KLS match for each tender line"),
+    'convert': (run_convert, "convert KLS codes to Aesculap codes"),
+    'integra': (run_integra, "search Integra products by keywords"),
+}
+
+
+def write_records(records: Iterable[dict], fields: list[str], output_format: str, output) -> int:
+    written = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields, lineterminator="\n")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            written += 1
+    else:
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=os.path.join(base_dir, "config.json"), help="path to config.json")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('queries', nargs='*', help="queries; read from stdin when neither these nor --file are given")
+        subparser.add_argument('-f', '--file', action='append', help="read queries from a file, one per line ('-' for stdin)")
+        subparser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        subparser.add_argument('-o', '--output', help="write records here instead of stdout")
+        if name in ('search', 'integra'):
+            subparser.add_argument('--limit', type=int, default=0, help="at most this many hits per query (0: all)")
+        if name == 'match':
+            subparser.add_argument('--batch', action='store_true', help="score with the vectorized matcher")
+            subparser.add_argument('--cache', help="SQLite file for the persistent match cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with contextlib.redirect_stdout(sys.stderr):
+        config = load_config(args.config)
+    if config is None:
+        return 2
+
+    run, _ = COMMANDS[args.command]
+    records = run(Datasets(config), iter_queries(args), args)
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        written = write_records(records, FIELDS[args.command], args.format, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{written} records", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.exit(main())
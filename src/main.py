@@ -1,64 +1,80 @@
-import regex
-import csv
 import sys
+if __name__ == '__main__' and getattr(sys, 'frozen', False):
+    # The PyInstaller build starts the pool workers from the exe: hand them
+    # over before any startup work (console setup, imports, config) runs.
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+import time
+startup = time.perf_counter()
+
+import argparse
+import regex
 import os
 from pathlib import Path
 import traceback
 
-os.system("")
-
-# Import custom module
-from BTM_Quote_Tool import load_config, string_cleaner, AesculapUtils, IntegraUtils, KLSUtils, Color, SupportUtils
-
-
-# Determine the correct base directory
-if getattr(sys, 'frozen', False):  
-    base_dir = sys._MEIPASS  # PyInstaller extracted folder
-else:
-    base_dir = os.path.abspath(os.path.dirname(__file__))  # Normal script path
-
-# Path to config.json (already correct)
-config_path = os.path.join(base_dir, "config.json")
-
-# Load JSON config
-config = load_config(config_path)
-
-# 🔥 Fix: Convert relative paths from config.json to absolute paths
-def get_absolute_path(relative_path):
-    """Convert relative paths from config.json into absolute paths."""
-    return os.path.join(base_dir, relative_path.strip(" ./\\"))  # Strip unnecessary `.` or `..`
-
-# 🔹 Use the helper function to fix all paths
-MartinSourceFile = Path(config['csv_source']['kls_product_csv'])
-AesculapSourceFile = Path(config['csv_source']['aesculap_product_csv'])
-IntegraSourceFile = Path(config['csv_source']['integra_product_csv'])
-
-MartinSourceText = Path(config['source_text']['kls_text'])
-IntegraSourceText = Path(config['source_text']['integra_text'])
-AesculapSourceText = Path(config['source_text']['aesculap_text'])
+# Everything below runs from main() or the __main__ block only: the pool
+# workers re-import this file as __mp_main__ on Windows and need none of it.
+
+
+def load_paths() -> dict[str, Path]:
+    """Source paths from config.json, next to this script (or the PyInstaller bundle)."""
+    from BTM_Quote_Tool import load_config
+
+    # Determine the correct base directory
+    if getattr(sys, 'frozen', False):
+        base_dir = sys._MEIPASS  # PyInstaller extracted folder
+    else:
+        base_dir = os.path.abspath(os.path.dirname(__file__))  # Normal script path
+    config = load_config(os.path.join(base_dir, "config.json"))
+    return {
+        'MartinSourceFile': Path(config['csv_source']['kls_product_csv']),
+        'AesculapSourceFile': Path(config['csv_source']['aesculap_product_csv']),
+        'IntegraSourceFile': Path(config['csv_source']['integra_product_csv']),
+        'MartinSourceText': Path(config['source_text']['kls_text']),
+        'IntegraSourceText': Path(config['source_text']['integra_text']),
+        'AesculapSourceText': Path(config['source_text']['aesculap_text']),
+    }
 
 
 # Main function
-def main():
+def main(client: 'QueryClient' = None, workers: int = None, paths: dict[str, Path] = None):
+    from BTM_Quote_Tool import string_cleaner, AesculapUtils, IntegraUtils, KLSUtils, Color, SupportUtils, CatalogText, DatasetWatcher, start_loads, correct_query, recorder, span, timed
+
+    os.system("")  # turns on ANSI colours in the Windows console
+    paths = paths or load_paths()
     loop_data = [[]]
-    # preloading all .txt resources.
-    with open(MartinSourceText, "r", encoding='utf-8') as file:
-        MartinCatalog = file.read().lower()
-    with open(IntegraSourceText, "r", encoding='utf-8') as file:
-        IntegraCatalog = file.read().lower()
-    with open(AesculapSourceText, "r", encoding='utf-8') as file:
-        AesculapCatalog = file.read().lower()
-
-    # Pre-process raw data for Aesculap, KLS, and Integra (csv)
+    # .txt resources are memory-mapped and indexed on first lookup.
+    MartinCatalog = CatalogText('KLS', paths['MartinSourceText'])
+    IntegraCatalog = CatalogText('INTEGRA', paths['IntegraSourceText'])
+    AesculapCatalog = CatalogText('AESCULAP', paths['AesculapSourceText'])
+
+    # Pre-process raw data for Aesculap, KLS, and Integra (csv), all at once and
+    # cleaned in a process pool; a command waits only for the datasets it uses.
+    # With a server, a dataset is only loaded by the first command needing it locally.
     objects = {
+        'Martin': KLSUtils(),
         'Aesculap': AesculapUtils(),
         'Integra': IntegraUtils(),
-        'Martin': KLSUtils()
     }
-
-    AesculapDataset = objects['Aesculap'].DataProcess(AesculapSourceFile)
-    IntegraDataset = objects['Integra'].DataProcess(IntegraSourceFile)
-    MartinDataset = objects['Martin'].DataProcess(MartinSourceFile)
+    sources = {
+        'Martin': (objects['Martin'], paths['MartinSourceFile']),
+        'Aesculap': (objects['Aesculap'], paths['AesculapSourceFile']),
+        'Integra': (objects['Integra'], paths['IntegraSourceFile']),
+    }
+    loads = start_loads(sources, workers) if client is None else {}
+
+    def need(name):
+        if name not in loads:
+            loads.update(start_loads({name: sources[name]}, workers))
+        if not loads[name].ready:
+            print(f"Loading {name} data . . .")
+        loader = loads[name].get()
+        if name not in watcher.sources:
+            # A new dict, the watcher thread may be iterating the old one
+            watcher.sources = {**watcher.sources, name: sources[name]}
+        return loader
 
         # main action
     def handle_help():
@@ -68,16 +84,20 @@ def main():
         print("Terminating. . . ")
         sys.exit(0)
 
+    @timed('command.reference')
     def handle_reference(keyword):
         SupportUtils.reference(keyword)
 
+    @timed('command.check')
     def handle_check(keyword):
-        SupportUtils.check(MartinDataset, keyword)
+        SupportUtils.check(need('Martin'), keyword)
 
+    @timed('command.inch')
     def handle_inch(keyword):
         value_in_cm = int(regex.match(r'\d+', keyword).group())
         print(value_in_cm * 2.54)
 
+    @timed('command.replace')
     def handle_replace(keyword):
         try:
             match = regex.findall(r'\d{2}-\d{3}-\d{2}-\d{2}', keyword)
@@ -87,75 +107,143 @@ def main():
         except Exception as err:
             print(f"ERROR : {err}")
 
+    @timed('command.load')
     def handle_load(keyword):
         keyword = keyword.replace('load', '').strip()
         SupportUtils.save(keyword)
         print("Product's code has been loaded.")
     
+    @timed('command.pick')
     def handle_pick(keyword, dataset : list[list]):
         keyword = keyword.replace('get', '').strip()
         SupportUtils.pick(keyword, dataset)
         print("Product's code has been picked.")
 
+    # Result pages on screen, for 'next' / 'prev' / '<n> page'
+    view = {'pages': None}
+
+    @timed('command.sculap')
     def handle_sculap(keyword):
         keyword = keyword.replace('sculap', '').strip()
-        temp = objects['Aesculap'].search(keyword, AesculapDataset)
+        aesculap = need('Aesculap')
+        temp = aesculap.search(keyword, aesculap.dataset)
         if temp:
-            objects['Aesculap'].display(temp)
+            view['pages'] = objects['Aesculap'].display(temp)
+
+    def handle_page(step=None, keyword=None):
+        pages = view['pages']
+        if pages is None:
+            print("No results to page through.")
+            return
+        try:
+            moved = pages.show(int(keyword.replace('page', '').strip()) - 1) if keyword else pages.show(pages.page + step)
+        except ValueError:
+            moved = False
+        if not moved:
+            print(f"Pages run from 1 to {pages.page_count}.")
 
+    @timed('command.integra')
     def handle_integra(keyword):
         product = keyword.replace('integra', '').strip()
-        objects['Integra'].search(product, IntegraDataset)
+        integra = need('Integra')
+        integra.search(product, integra.dataset)
 
+    # Sources the 'refresh' and 'watch' commands keep in sync with the CSVs, added by `need` once loaded
+    watcher = DatasetWatcher({})
+
+    @timed('command.refresh')
     def handle_refresh():
-        global MartinDataset
-        MartinDataset = objects['Martin'].DataProcess(MartinSourceFile)
+        for name in loads:
+            need(name)
+        # Datasets are patched in place, the names bound above stay valid
+        for name, (added, modified, removed) in watcher.poll().items():
+            print(f"{name}: {added} added, {modified} modified, {removed} removed.")
         print("Data has been updated. Continuing . . ")
 
+    def handle_watch():
+        if watcher.running:
+            watcher.stop()
+            print("Stopped watching the CSV files.")
+        else:
+            for name in loads:
+                need(name)
+            watcher.start()
+            print("Watching the CSV files, saved edits are applied automatically.")
+
     def handle_clear():
         os.system('cls')
 
+    @timed('command.search_by_code')
     def handle_search_by_code(keyword):
-        return objects['Martin'].SearchByCode(keyword, AesculapDataset)
+        return need('Martin').SearchByCode(keyword, need('Aesculap'))
+
+    def search_products(keyword):
+        # Ask the shared server first when there is one, it may have fresher data
+        if client is not None:
+            try:
+                return client.search(keyword)
+            except (OSError, RuntimeError) as err:
+                print(f"Server unavailable ({err}), searching locally.")
+        return need('Martin').search(keyword)
+
+    def show_fallback(keyword) -> bool:
+        """Looks the keyword up as an Aesculap / Integra code, then in the catalogs. True if anything was shown."""
+        keyword_upper = keyword.upper().strip()
+        AesculapDataset, IntegraDataset = need('Aesculap').dataset, need('Integra').dataset
+        if keyword_upper in AesculapDataset.keys():
+            temp = {keyword_upper: AesculapDataset[keyword_upper]}
+            objects['Aesculap'].display(temp)
+        elif keyword_upper in IntegraDataset:
+            description = IntegraDataset[keyword_upper]
+            print(f"{keyword_upper}  {description}")
+        elif hits := MartinCatalog.find(keyword):
+            print("Look up the KLS Catalog.")
+            MartinCatalog.display(hits, keyword)
+        elif hits := IntegraCatalog.find(keyword):
+            print("Look up the INTEGRA catalog.")
+            IntegraCatalog.display(hits, keyword)
+        elif hits := AesculapCatalog.find(keyword):
+            print("Look up the AESCULAP catalog.")
+            AesculapCatalog.display(hits, keyword)
+        else:
+            return False
+        return True
 
     def handle_search(keyword):
-        matching_products = objects['Martin'].search(keyword)
-        if not matching_products:
-            keyword_upper = keyword.upper().strip()
-            if keyword_upper in AesculapDataset.keys():
-                temp = {keyword_upper: AesculapDataset[keyword_upper]}
-                objects['Aesculap'].display(temp)
-            elif keyword_upper in IntegraDataset:
-                description = IntegraDataset[keyword_upper]
-                print(f"{keyword_upper}  {description}")
-            elif keyword in MartinCatalog:
-                print("Look up the KLS Catalog.")
-            elif keyword in IntegraCatalog:
-                print("Look up the INTEGRA catalog.")
-            elif keyword in AesculapCatalog:
-                print("Look up the AESCULAP catalog.")
-            else:
-                print("No match found for keyword.")
-                if input("Re-enter keyword or 0 to terminate: ") == '0':
-                    sys.exit(0)
-        else:
-            keys = keyword.split()
-            if len(matching_products.keys()) > 300:
-                confirm_input = input("More than 300 results. continue? (y) ")
-                if confirm_input == 'y':
-                    KLSUtils.display(matching_products, keys)
-            else:
-                temp = KLSUtils.display(matching_products, keys)
-                return temp
+        # Only the search and the display are timed, never the prompts below
+        with span('command.search'):
+            matching_products = search_products(keyword)
+            if matching_products:
+                # Only the first page is rendered, 'next' / 'prev' draw the others
+                view['pages'] = KLSUtils.display(matching_products, keyword.split())
+                return view['pages']
+            if show_fallback(keyword):
+                return None
+            corrected = correct_query(keyword, [need(name).spelling for name in sources])
+
+        if corrected and input(f"No match found. Did you mean '{corrected}'? (y): ").strip() == 'y':
+            return handle_search(corrected)
+        print("No match found for keyword.")
+        if input("Re-enter keyword or 0 to terminate: ") == '0':
+            sys.exit(0)
+
+    def handle_stats():
+        print(recorder.report())
 
     keyword_handlers = {
         'help': handle_help,
+        'stats': handle_stats,
+        'next': lambda: handle_page(1),
+        'prev': lambda: handle_page(-1),
         'end': handle_terminate,
         'refresh': handle_refresh,
+        'watch': handle_watch,
         'clear': handle_clear,
         'cls': handle_clear,
     }
 
+    if recorder.enabled:
+        recorder.record('startup.first_prompt', time.perf_counter() - startup)
     while True:
         command = input("Enter any key to start, 0 to terminate, 'help' to open guide: ").strip()
         if command == 'help':
@@ -163,44 +251,71 @@ def main():
         elif command == '0':
             handle_terminate()
         else:
-            print(f"Report:\nNumber of items acquired: {len(MartinDataset)}\nProceeding. . .")
+            if client is None:
+                print(f"Report:\nNumber of items acquired: {len(need('Martin').dataset)}\nProceeding. . .")
+            else:
+                host, port = client.address
+                print(f"Report:\nSearching through the server at {host}:{port}\nProceeding. . .")
 
             
             while True:
                 keyword = input(Color.wrap_text("Enter keyword: ", Color.RED))
-                keyword = string_cleaner(keyword)
-
-                if keyword in keyword_handlers:
-                    keyword_handlers[keyword]()
-                    continue
-
-                if keyword.endswith('rf'):
-                    handle_reference(keyword)
-                elif keyword.endswith('code'):
-                    handle_check(keyword)
-                elif keyword.endswith('inch'):
-                    handle_inch(keyword)
-                elif keyword.endswith('replace'):
-                    handle_replace(keyword)
-                elif keyword.endswith('load'):
-                    handle_load(keyword)
-                elif keyword.endswith('get'):
-                    handle_pick(keyword, loop_data)    
-                elif keyword.endswith('sculap'):
-                    handle_sculap(keyword)
-                elif keyword.endswith('integra'):
-                    handle_integra(keyword)
-                elif regex.fullmatch(r'\d{2}-\d{3}-\d{2}-\d{2}', keyword):
-                    if handle_search_by_code(keyword):
+                with span('command.clean_input'):
+                    keyword = string_cleaner(keyword)
+
+                with watcher.lock:
+                    if keyword in keyword_handlers:
+                        keyword_handlers[keyword]()
                         continue
-                else:
-                    loop_data = handle_search(keyword)
+
+                    if keyword.endswith('rf'):
+                        handle_reference(keyword)
+                    elif keyword.endswith('code'):
+                        handle_check(keyword)
+                    elif keyword.endswith('inch'):
+                        handle_inch(keyword)
+                    elif keyword.endswith('replace'):
+                        handle_replace(keyword)
+                    elif keyword.endswith('load'):
+                        handle_load(keyword)
+                    elif keyword.endswith('get'):
+                        handle_pick(keyword, loop_data)    
+                    elif keyword.endswith('sculap'):
+                        handle_sculap(keyword)
+                    elif keyword.endswith('integra'):
+                        handle_integra(keyword)
+                    elif regex.fullmatch(r'\d+ page', keyword):
+                        handle_page(keyword=keyword)
+                    elif regex.fullmatch(r'\d{2}-\d{3}-\d{2}-\d{2}', keyword):
+                        if handle_search_by_code(keyword):
+                            continue
+                    else:
+                        loop_data = handle_search(keyword)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search and quote surgical instruments.")
+    parser.add_argument('--stats', action='store_true', help="time each stage, shown by the 'stats' command")
+    parser.add_argument('--trace', metavar='FILE', help="also append every timing span to FILE as JSON lines")
+    parser.add_argument('--server', metavar='HOST:PORT', help="send searches to a running server.py")
+    parser.add_argument('--workers', type=int, help="processes cleaning the CSVs (default: one per core, 1: none)")
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    print("Source file : ",MartinSourceFile)
+    from BTM_Quote_Tool import QueryClient, recorder
+
+    args = parse_args()
+    if args.stats or args.trace:
+        recorder.enable(args.trace)
+    client = None
+    if args.server:
+        host, _, port = args.server.rpartition(':')
+        client = QueryClient(host or '127.0.0.1', int(port))
     try:
-        main()
+        paths = load_paths()
+        print("Source file : ", paths['MartinSourceFile'])
+        main(client, args.workers, paths)
     except Exception as e:
         print(f"ERROR: {e}")
         traceback.print_exc()
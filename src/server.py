@@ -0,0 +1,161 @@
+"""Local query server keeping the datasets warm.
+
+Loads the KLS, Aesculap and Integra datasets once and answers JSON
+requests from any number of clients over a local TCP socket, one JSON
+object per line each way:
+
+    {"op": "search", "queries": ["kéo mayo cong"], "limit": 20}
+    -> {"ok": true, "records": [{"query": ..., "code": ..., ...}, ...]}
+
+`op` is any cli.py subcommand (search, lookup-code, match, convert,
+integra) or "ping"; records are the ones cli.py prints. At most
+--concurrency requests run at once, the rest wait their turn; `match`
+requests are scored in a process pool so they never stall the lookups;
+the workers read the KLS products from one shared memory copy and get
+the matcher tables prepared once by the server.
+
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import logging
+import os
+import signal
+import sys
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+
+from BTM_Quote_Tool import load_config, ProductStore
+from BTM_Quote_Tool.matcher import MatcherContext, iter_matches
+from cli import COMMANDS, Datasets, base_dir, matcher_context
+
+DEFAULT_PORT = 8765
+_worker = {}
+
+
+def _init_worker(context: MatcherContext, store_name: str):
+    """Match workers take the server's matcher context and read the KLS products from its shared memory copy."""
+    context.store = ProductStore.attach(store_name)
+    _worker['context'] = context
+
+
+def _match_worker(queries: list[str], batch: bool) -> list[dict]:
+    log = logging.getLogger('server.match')
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+    return [
+        {'query': query, 'code': code, 'match': match, 'score': score}
+        for _, query, code, match, score in iter_matches(log, log, queries, None, batch=batch, context=_worker['context'])
+    ]
+
+
+class QueryServer:
+    def __init__(self, config: dict, concurrency: int = 8, workers: int = None):
+        self.config = config
+        self.datasets = Datasets(config)
+        self.slots = asyncio.Semaphore(concurrency)
+        self.workers = workers
+        self.pool = None
+        self.shared = None
+        self.served = 0
+
+    def warm_up(self):
+        """Loads every dataset and starts the match workers before accepting clients."""
+        self.datasets.kls, self.datasets.aesculap, self.datasets.integra
+        if self.workers != 0:
+            kls = self.datasets.kls
+            context = matcher_context(self.config, kls)
+            context.prepare()
+            self.shared = kls.dataset.export_shared()
+            # The workers attach the shared store; the index was only needed to build the postings
+            template = copy.copy(context)
+            template.store = template.index = None
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(template, self.shared.name))
+            self.pool.submit(_match_worker, [], False).result()
+
+    async def dispatch(self, request: dict) -> dict:
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True, 'served': self.served}
+        if op not in COMMANDS:
+            return {'ok': False, 'error': f"unknown op {op!r}"}
+        queries = request.get('queries')
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            return {'ok': False, 'error': "queries must be a list of strings"}
+
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            if op == 'match' and self.pool is not None:
+                records = await loop.run_in_executor(self.pool, _match_worker, queries, bool(request.get('batch')))
+            else:
+                run, _ = COMMANDS[op]
+                options = Namespace(limit=int(request.get('limit') or 0), batch=bool(request.get('batch')), cache=None)
+                records = await loop.run_in_executor(None, lambda: list(run(self.datasets, queries, options)))
+        self.served += 1
+        return {'ok': True, 'records': records}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except (ValueError, AttributeError) as err:
+                    response = {'ok': False, 'error': f"bad request: {err}"}
+                except Exception as err:
+                    response = {'ok': False, 'error': str(err)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port, limit=1 << 24)
+        print(f"Serving on {host}:{port}", file=sys.stderr)
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+        async with server:
+            await stop.wait()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--config', default=os.path.join(base_dir, "config.json"))
+    parser.add_argument('--concurrency', type=int, default=8, help="requests processed at the same time")
+    parser.add_argument('--workers', type=int, default=None, help="match processes (default: one per core, 0: none)")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        config = load_config(args.config)
+    if config is None:
+        return 2
+    server = QueryServer(config, args.concurrency, args.workers)
+    server.warm_up()
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
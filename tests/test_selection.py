@@ -0,0 +1,154 @@
+"""Journal replay, compaction and text file sync of SelectedCodes.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from BTM_Quote_Tool.selection import SelectedCodes
+
+
+def open_store(tmp_path: Path, **kwargs) -> SelectedCodes:
+    return SelectedCodes(tmp_path / 'selected_code.journal', tmp_path / 'selected_code.txt', **kwargs)
+
+
+def journal_records(tmp_path: Path) -> list[list[str]]:
+    with open(tmp_path / 'selected_code.journal', 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def touch_later(file_path: Path, other: Path):
+    """Moves file_path's mtime past other's, whatever the file system's time resolution."""
+    mtime_ns = os.stat(other).st_mtime_ns + 1_000_000_000
+    os.utime(file_path, ns=(mtime_ns, mtime_ns))
+
+
+def test_replay_restores_picks_and_replaces(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    store.append("10-003-02-07 x2")
+    assert store.replace("10-002-01-07", "10-002-01-08") == 1
+    store.sync()
+    store.file.close()  # crash: no compaction or export on the way out
+
+    store = open_store(tmp_path)
+    assert list(store) == ["10-002-01-08", "10-003-02-07 x2"]
+    assert store.positions["10-003-02-07"] == {1}
+    store.close()
+
+
+def test_torn_record_is_dropped_and_cut(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    store.append("10-003-02-07")
+    store.sync()
+    store.file.close()
+    journal = tmp_path / 'selected_code.journal'
+    whole = journal.stat().st_size
+    with open(journal, 'ab') as file:
+        file.write(b'["+", "10-004-')  # crash half way through a record
+
+    store = open_store(tmp_path)
+    assert list(store) == ["10-002-01-07", "10-003-02-07"]
+    assert journal.stat().st_size == whole
+    store.append("10-005-03-07")
+    store.close()
+    assert list(open_store(tmp_path)) == ["10-002-01-07", "10-003-02-07", "10-005-03-07"]
+
+
+def test_compaction_rewrites_one_record_per_line(tmp_path):
+    store = open_store(tmp_path, sync_every=4, compact_ratio=2.0)
+    store.append("10-002-01-07")
+    for number in range(20):
+        store.replace(f"10-002-01-{number + 7:02}", f"10-002-01-{number + 8:02}")
+    assert store.records <= 2 * len(store) + store.sync_every
+    store.close()
+    assert journal_records(tmp_path) == [['+', "10-002-01-27"]]
+    assert not (tmp_path / 'selected_code.journal.tmp').exists()
+    assert list(open_store(tmp_path)) == ["10-002-01-27"]
+
+
+def test_picks_append_to_the_text_file(tmp_path):
+    store = open_store(tmp_path)
+    text = tmp_path / 'selected_code.txt'
+    store.append("10-002-01-07")
+    inode = os.stat(text).st_ino
+    for number in range(3, 50):
+        store.append(f"10-{number:03}-02-07")
+    assert os.stat(text).st_ino == inode  # appended to, never swapped for a rewritten copy
+    assert text.read_text(encoding='utf-8').splitlines() == list(store)
+    store.replace("10-002-01-07", "10-002-01-08")
+    assert text.read_text(encoding='utf-8').splitlines()[0] == "10-002-01-08"
+    store.clear()
+    assert text.read_text(encoding='utf-8') == ""
+    store.close()
+
+
+def test_pick_after_an_unterminated_last_line(tmp_path):
+    store = open_store(tmp_path)
+    text = tmp_path / 'selected_code.txt'
+    text.write_text("10-009-09-09", encoding='utf-8')
+    store.append("10-002-01-07")
+    store.import_text()
+    assert list(store) == ["10-009-09-09", "10-002-01-07"]
+    store.close()
+
+
+def test_text_edited_between_sessions_wins(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    store.close()
+    text = tmp_path / 'selected_code.txt'
+    text.write_text("10-009-09-09\n", encoding='utf-8')
+    touch_later(text, tmp_path / 'selected_code.journal')
+
+    store = open_store(tmp_path)
+    assert list(store) == ["10-009-09-09"]
+    store.close()
+    assert text.read_text(encoding='utf-8') == "10-009-09-09\n"
+    assert list(open_store(tmp_path)) == ["10-009-09-09"]
+
+
+def test_text_edited_during_session_is_kept(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    text = tmp_path / 'selected_code.txt'
+    text.write_text("10-009-09-09\n", encoding='utf-8')
+    store.append("10-003-02-07")
+    assert store.import_text()  # what the commands reading the picks run first
+    assert list(store) == ["10-009-09-09", "10-003-02-07"]
+    assert store.replace("10-003-02-07", "10-003-02-08") == 1
+    text.write_text("10-009-09-09\n10-003-02-08\n10-004-02-07\n", encoding='utf-8')
+    store.close()
+    assert text.read_text(encoding='utf-8') == "10-009-09-09\n10-003-02-08\n10-004-02-07\n"
+    assert list(open_store(tmp_path)) == ["10-009-09-09", "10-003-02-08", "10-004-02-07"]
+
+
+def test_deleted_text_file_is_written_again(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    (tmp_path / 'selected_code.txt').unlink()
+    assert not store.import_text()
+    assert list(store) == ["10-002-01-07"]
+    assert (tmp_path / 'selected_code.txt').read_text(encoding='utf-8') == "10-002-01-07\n"
+    store.close()
+
+
+def test_journal_newer_than_text_is_exported(tmp_path):
+    store = open_store(tmp_path)
+    store.append("10-002-01-07")
+    store.close()
+    text, journal = tmp_path / 'selected_code.txt', tmp_path / 'selected_code.journal'
+    with open(journal, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(['+', "10-003-02-07"]) + "\n")  # journaled, then a crash before the export
+    touch_later(journal, text)
+
+    store = open_store(tmp_path)
+    assert list(store) == ["10-002-01-07", "10-003-02-07"]
+    assert text.read_text(encoding='utf-8') == "10-002-01-07\n10-003-02-07\n"
+    store.close()